@@ -1,12 +1,16 @@
 """Integration IMO Ismart Modbus Relay Control."""
 import logging
 import asyncio
+import time
 
 import voluptuous as vol
-from homeassistant.const import Platform
-from homeassistant.core import HomeAssistant, ServiceCall
+from homeassistant.const import EVENT_HOMEASSISTANT_STOP, Platform
+from homeassistant.core import Event, HomeAssistant, ServiceCall, ServiceResponse, SupportsResponse
+from homeassistant.exceptions import HomeAssistantError
 from homeassistant.helpers import config_validation as cv
 from homeassistant.helpers.discovery import async_load_platform
+from homeassistant.helpers.start import async_at_started
+from homeassistant.util import dt as dt_util
 
 from .const import (
     DOMAIN,
@@ -22,6 +26,7 @@ from .const import (
     CONF_RELAY_ICON,
     CONF_RELAY_DEVICE_CLASS,
     CONF_RELAY_DEVICE_ID,
+    CONF_RELAY_SKIP_REDUNDANT,
     CONF_LIGHTS,
     CONF_LIGHT_COIL_ADDRESS,
     CONF_LIGHT_DEVICE_CLASS,
@@ -42,8 +47,84 @@ from .const import (
     CONF_SHUTTER_UP_COIL,
     CONF_SHUTTER_UP_POSITION,
     CONF_SHUTTERT_DEVICE_CLASS,
+    CONF_SENSORS,
+    CONF_WRITE_WINDOW,
+    CONF_WRITE_RATE_LIMIT,
+    CONF_WRITE_BURST,
+    CONF_STATE_MAX_AGE,
+    CONF_TOGGLE_VERIFY_DELAY,
+    CONF_BROADCAST_SETTLE,
+    DEFAULT_BROADCAST_SETTLE,
+    CONF_HISTORY_SIZE,
+    DEFAULT_HISTORY_SIZE,
+    CONF_INTERLOCKS,
+    CONF_INTERLOCK_DEVICE_ID,
+    CONF_INTERLOCK_COILS,
+    CONF_INTERLOCK_DELAY,
+    DEFAULT_INTERLOCK_DELAY,
+    DEFAULT_WRITE_WINDOW,
+    DEFAULT_WRITE_RATE_LIMIT,
+    DEFAULT_WRITE_BURST,
+    DEFAULT_STATE_MAX_AGE,
+    DEFAULT_TOGGLE_VERIFY_DELAY,
+    CONF_PROXY,
+    CONF_PROXY_HOST,
+    CONF_PROXY_PORT,
+    CONF_PROXY_MAX_CACHE_AGE,
+    CONF_PROXY_RATE_LIMIT,
+    CONF_PROXY_BURST,
+    DEFAULT_PROXY_HOST,
+    DEFAULT_PROXY_PORT,
+    DEFAULT_PROXY_MAX_CACHE_AGE,
+    DEFAULT_PROXY_RATE_LIMIT,
+    DEFAULT_PROXY_BURST,
+    CONF_SENSOR_NAME,
+    CONF_SENSOR_DEVICE_ID,
+    CONF_SENSOR_ADDRESS,
+    CONF_SENSOR_REGISTER_TYPE,
+    CONF_SENSOR_DATA_TYPE,
+    CONF_SENSOR_WORD_ORDER,
+    CONF_SENSOR_SCALE,
+    CONF_SENSOR_OFFSET,
+    CONF_SENSOR_PRECISION,
+    CONF_SENSOR_UNIT,
+    CONF_SENSOR_ICON,
+    CONF_SENSOR_DEVICE_CLASS,
+    CONF_SENSOR_DEADBAND,
+    CONF_SENSOR_DEADBAND_PERCENT,
+    CONF_SENSOR_MIN_INTERVAL,
+    DATA_TYPE_REGISTER_COUNT,
+    DATA_TYPE_UINT16,
+    DEFAULT_POLL_INTERVAL,
+    DEFAULT_PARITY,
+    DEFAULT_STOPBITS,
+    CONF_POLL_INTERVAL,
+    CONF_SLAVE_POLL_INTERVALS,
+    CONF_BUS_BUDGET,
+    CONF_BUDGET_TARGET,
+    CONF_BUDGET_WRITE_RESERVE,
+    CONF_BUDGET_TURNAROUND,
+    CONF_BUDGET_MODE,
+    BUDGET_MODE_WARN,
+    BUDGET_MODE_REFUSE,
+    BUDGET_MODE_AUTO,
+    DEFAULT_BUDGET_TARGET,
+    DEFAULT_BUDGET_WRITE_RESERVE,
+    DEFAULT_BUDGET_TURNAROUND_MS,
+    OUTPUT_STATE_REGISTER,
+    REGISTER_HOLDING,
+    REGISTER_INPUT,
 )
+from .budget import char_time, measured_turnaround, plan_budget
+from .bus import PRIORITY_POLL, ModbusBus
+from .commands import CommandFilter
+from .history import BITS_PER_WORD, OutputHistory
 from .modbus_client import ModbusRTUClient
+from .poller import Poller
+from .profiling import StartupProfiler
+from .proxy import ModbusTCPProxy
+from .read_plan import RegisterCache, build_read_plan, output_bit_index
+from .sequences import CoilStep, SequenceRunner, pulse_steps
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -58,6 +139,7 @@ RELAY_SCHEMA = vol.Schema({
     vol.Optional(CONF_RELAY_ICON, default="mdi:electric-switch"): cv.icon,  # Icon symbole interrupteur classique
     vol.Optional(CONF_RELAY_DEVICE_CLASS): cv.string,
     vol.Optional(CONF_RELAY_DEVICE_ID): cv.positive_int,  # Identifiant esclave spécifique au relais
+    vol.Optional(CONF_RELAY_SKIP_REDUNDANT, default=False): cv.boolean,    # Ne pas écrire si l'état connu est déjà le bon
 })
 """
 SHUTTER_SCHEMA = vol.Schema({
@@ -85,6 +167,56 @@ LIGHT_SCHEMA = vol.Schema({
     vol.Optional(CONF_LIGHT_DEVICE_CLASS): cv.string,   
 })
 
+SENSOR_SCHEMA = vol.Schema({
+    vol.Required(CONF_SENSOR_NAME): cv.string,
+    vol.Optional(CONF_SENSOR_DEVICE_ID): cv.positive_int,                   # Esclave (défaut: slave_id)
+    vol.Required(CONF_SENSOR_ADDRESS): cv.positive_int,                     # Adresse du (premier) registre
+    vol.Optional(CONF_SENSOR_REGISTER_TYPE, default=REGISTER_HOLDING): vol.In([REGISTER_HOLDING, REGISTER_INPUT]),
+    vol.Optional(CONF_SENSOR_DATA_TYPE, default=DATA_TYPE_UINT16): vol.In(list(DATA_TYPE_REGISTER_COUNT)),
+    vol.Optional(CONF_SENSOR_WORD_ORDER, default="big"): vol.In(["big", "little"]),
+    vol.Optional(CONF_SENSOR_SCALE, default=1.0): vol.Coerce(float),         # valeur = brut * scale + offset
+    vol.Optional(CONF_SENSOR_OFFSET, default=0.0): vol.Coerce(float),
+    vol.Optional(CONF_SENSOR_PRECISION): cv.positive_int,                   # Nombre de décimales
+    vol.Optional(CONF_SENSOR_UNIT): cv.string,
+    vol.Optional(CONF_SENSOR_ICON): cv.icon,
+    vol.Optional(CONF_SENSOR_DEVICE_CLASS): cv.string,
+    vol.Optional(CONF_SENSOR_DEADBAND, default=0.0): vol.All(vol.Coerce(float), vol.Range(min=0)),
+    vol.Optional(CONF_SENSOR_DEADBAND_PERCENT, default=0.0): vol.All(vol.Coerce(float), vol.Range(min=0)),
+    vol.Optional(CONF_SENSOR_MIN_INTERVAL, default=0.0): vol.All(vol.Coerce(float), vol.Range(min=0)),
+})
+
+# Proxy Modbus TCP optionnel: permet à d'autres logiciels de partager le bus RS485
+PROXY_SCHEMA = vol.Schema({
+    vol.Optional(CONF_PROXY_HOST, default=DEFAULT_PROXY_HOST): cv.string,
+    vol.Optional(CONF_PROXY_PORT, default=DEFAULT_PROXY_PORT): cv.port,
+    vol.Optional(CONF_PROXY_MAX_CACHE_AGE, default=DEFAULT_PROXY_MAX_CACHE_AGE): vol.All(vol.Coerce(float), vol.Range(min=0)),
+    vol.Optional(CONF_PROXY_RATE_LIMIT, default=DEFAULT_PROXY_RATE_LIMIT): vol.All(vol.Coerce(float), vol.Range(min=0.1)),
+    vol.Optional(CONF_PROXY_BURST, default=DEFAULT_PROXY_BURST): vol.All(vol.Coerce(int), vol.Range(min=1)),
+})
+
+# Interverrouillage: bobines d'un automate jamais actives ensemble (ex: montée/descente d'un volet)
+INTERLOCK_SCHEMA = vol.Schema({
+    vol.Optional(CONF_INTERLOCK_DEVICE_ID): cv.positive_int,                # Esclave (défaut: slave_id)
+    vol.Required(CONF_INTERLOCK_COILS): vol.All(cv.ensure_list, [cv.positive_int], vol.Length(min=2)),
+    vol.Optional(CONF_INTERLOCK_DELAY, default=DEFAULT_INTERLOCK_DELAY): vol.All(vol.Coerce(float), vol.Range(min=0)),
+})
+
+# Étape d'une séquence: écriture d'une bobine après un délai depuis l'étape précédente
+SEQUENCE_STEP_SCHEMA = vol.Schema({
+    vol.Required("address"): cv.positive_int,
+    vol.Required("state"): cv.boolean,
+    vol.Optional("device_id"): cv.positive_int,
+    vol.Optional("delay", default=0.0): vol.All(vol.Coerce(float), vol.Range(min=0)),
+})
+
+# Budget de temps du bus: vérifie au démarrage que la lecture cyclique laisse de la place aux commandes
+BUS_BUDGET_SCHEMA = vol.Schema({
+    vol.Optional(CONF_BUDGET_TARGET, default=DEFAULT_BUDGET_TARGET): vol.All(vol.Coerce(float), vol.Range(min=0.05, max=1)),
+    vol.Optional(CONF_BUDGET_WRITE_RESERVE, default=DEFAULT_BUDGET_WRITE_RESERVE): vol.All(vol.Coerce(float), vol.Range(min=0, max=1)),
+    vol.Optional(CONF_BUDGET_TURNAROUND, default=DEFAULT_BUDGET_TURNAROUND_MS): vol.All(vol.Coerce(float), vol.Range(min=0)),
+    vol.Optional(CONF_BUDGET_MODE, default=BUDGET_MODE_WARN): vol.In([BUDGET_MODE_WARN, BUDGET_MODE_REFUSE, BUDGET_MODE_AUTO]),
+})
+
 # Schéma de configuration
 CONFIG_SCHEMA = vol.Schema({
     DOMAIN: vol.Schema({
@@ -94,6 +226,23 @@ CONFIG_SCHEMA = vol.Schema({
         vol.Required(CONF_SLAVE_ID, default=1): cv.positive_int,
         vol.Optional(CONF_NAME, default="IMO Relay"): cv.string,
         vol.Required(CONF_RELAYS): vol.All(cv.ensure_list, [RELAY_SCHEMA]),
+        vol.Optional(CONF_LIGHTS, default=[]): vol.All(cv.ensure_list, [LIGHT_SCHEMA]),
+        vol.Optional(CONF_SENSORS, default=[]): vol.All(cv.ensure_list, [SENSOR_SCHEMA]),
+        vol.Optional(CONF_PROXY): PROXY_SCHEMA,
+        vol.Optional(CONF_POLL_INTERVAL, default=DEFAULT_POLL_INTERVAL): vol.All(vol.Coerce(float), vol.Range(min=0.1)),
+        vol.Optional(CONF_SLAVE_POLL_INTERVALS, default={}): {
+            vol.Coerce(int): vol.All(vol.Coerce(float), vol.Range(min=0.1))
+        },
+        vol.Optional(CONF_BUS_BUDGET, default={}): BUS_BUDGET_SCHEMA,
+        # Protection du chemin des commandes
+        vol.Optional(CONF_WRITE_WINDOW, default=DEFAULT_WRITE_WINDOW): vol.All(vol.Coerce(float), vol.Range(min=0)),
+        vol.Optional(CONF_WRITE_RATE_LIMIT, default=DEFAULT_WRITE_RATE_LIMIT): vol.All(vol.Coerce(float), vol.Range(min=0.1)),
+        vol.Optional(CONF_WRITE_BURST, default=DEFAULT_WRITE_BURST): vol.All(vol.Coerce(int), vol.Range(min=1)),
+        vol.Optional(CONF_STATE_MAX_AGE, default=DEFAULT_STATE_MAX_AGE): vol.All(vol.Coerce(float), vol.Range(min=0)),
+        vol.Optional(CONF_TOGGLE_VERIFY_DELAY, default=DEFAULT_TOGGLE_VERIFY_DELAY): vol.All(vol.Coerce(float), vol.Range(min=0)),
+        vol.Optional(CONF_BROADCAST_SETTLE, default=DEFAULT_BROADCAST_SETTLE): vol.All(vol.Coerce(float), vol.Range(min=0)),
+        vol.Optional(CONF_HISTORY_SIZE, default=DEFAULT_HISTORY_SIZE): vol.All(vol.Coerce(int), vol.Range(min=1)),
+        vol.Optional(CONF_INTERLOCKS, default=[]): vol.All(cv.ensure_list, [INTERLOCK_SCHEMA]),
     })
 }, extra=vol.ALLOW_EXTRA)
 
@@ -104,14 +253,17 @@ async def async_setup(hass: HomeAssistant, config: dict) -> bool:
         return True
     
     conf = config[DOMAIN]
+    profiler = StartupProfiler()
+    setup_start = time.monotonic()
     
     # Créer le client Modbus (with parity E like working config)
+    # Le port n'est ouvert qu'après le démarrage de Home Assistant (voir async_start_bus)
     client = ModbusRTUClient(
         port=conf[CONF_PORT],
         baudrate=conf[CONF_BAUDRATE],
         bytesize=conf[CONF_BYTESIZE],
-        parity="N",
-        stopbits=1,
+        parity=DEFAULT_PARITY,
+        stopbits=DEFAULT_STOPBITS,
         timeout=5,
         slave_id=conf[CONF_SLAVE_ID],
         name=conf[CONF_NAME],
@@ -119,83 +271,166 @@ async def async_setup(hass: HomeAssistant, config: dict) -> bool:
         message_wait_ms=30,
     )
     
-    # Test de connexion
-    try:
-        await hass.async_add_executor_job(client.connect)
-        _LOGGER.info(f"Connected to IMO device on {conf[CONF_PORT]}")
-    except Exception as e:
-        _LOGGER.error(f"Failed to connect to IMO device: {e}")
-        return False
-    
+    # Toutes les transactions (lecture, commandes, proxy) passent par l'ordonnanceur du bus.
+    # Il n'est démarré qu'une fois le port ouvert: les commandes reçues avant attendent dans sa file.
+    bus = ModbusBus(hass, client)
+
+    cache = RegisterCache()
+    commands = CommandFilter(
+        bus=bus,
+        cache=cache,
+        window=conf[CONF_WRITE_WINDOW],
+        rate_limit=conf[CONF_WRITE_RATE_LIMIT],
+        burst=conf[CONF_WRITE_BURST],
+        state_max_age=conf[CONF_STATE_MAX_AGE],
+        verify_delay=conf[CONF_TOGGLE_VERIFY_DELAY],
+        interlocks=[
+            (
+                interlock.get(CONF_INTERLOCK_DEVICE_ID, conf[CONF_SLAVE_ID]),
+                interlock[CONF_INTERLOCK_COILS],
+                interlock[CONF_INTERLOCK_DELAY],
+            )
+            for interlock in conf[CONF_INTERLOCKS]
+        ],
+    )
+    # Impulsions et séquences minutées (services pulse et sequence)
+    sequences = SequenceRunner(hass, commands)
+
     hass.data[DOMAIN] = {
         "client": client,
+        "bus": bus,
+        "commands": commands,
+        "sequences": sequences,
         "config": conf,
         "relays": conf[CONF_RELAYS],
         "lights": conf[CONF_LIGHTS],
+        "sensors": conf[CONF_SENSORS],
         "entities": [],  # Liste des entités pour mise à jour globale
+        "light_entities": [],
+        "sensor_entities": [],
+        "cache": cache,
+        "history": OutputHistory(conf[CONF_HISTORY_SIZE]),
+        "profiler": profiler,
     }
+
+    # Compiler le plan de lecture: une liste de plages (spans) fusionnées par automate.
+    # Le registre d'état des sorties (0x0613) et les registres analogiques proches
+    # sont ainsi lus dans la même trame.
+    blocks_by_device = {}
+    for relay_conf in conf[CONF_RELAYS]:
+        device_id = relay_conf.get(CONF_RELAY_DEVICE_ID, conf[CONF_SLAVE_ID])
+        blocks = blocks_by_device.setdefault(device_id, {}).setdefault(REGISTER_HOLDING, [])
+        if (OUTPUT_STATE_REGISTER, 1) not in blocks:
+            blocks.append((OUTPUT_STATE_REGISTER, 1))
+    for light_conf in conf[CONF_LIGHTS]:
+        blocks = blocks_by_device.setdefault(light_conf[CONF_LIGHT_DEVICE_ID], {}).setdefault(REGISTER_HOLDING, [])
+        if (light_conf[CONF_LIGHT_READ_ADDRESS], 1) not in blocks:
+            blocks.append((light_conf[CONF_LIGHT_READ_ADDRESS], 1))
+    for sensor_conf in conf[CONF_SENSORS]:
+        device_id = sensor_conf.get(CONF_SENSOR_DEVICE_ID, conf[CONF_SLAVE_ID])
+        blocks_by_device.setdefault(device_id, {}).setdefault(sensor_conf[CONF_SENSOR_REGISTER_TYPE], []).append(
+            (sensor_conf[CONF_SENSOR_ADDRESS], DATA_TYPE_REGISTER_COUNT[sensor_conf[CONF_SENSOR_DATA_TYPE]])
+        )
+    read_plan = build_read_plan(blocks_by_device)
+    hass.data[DOMAIN]["read_plan"] = read_plan
+
+    # Budget de temps du bus: temps de lecture par cycle comparé à l'utilisation cible
+    budget_conf = conf[CONF_BUS_BUDGET]
+    t_char = char_time(conf[CONF_BAUDRATE], conf[CONF_BYTESIZE], DEFAULT_PARITY, DEFAULT_STOPBITS)
+    poll_intervals = {
+        device_id: conf[CONF_SLAVE_POLL_INTERVALS].get(device_id, conf[CONF_POLL_INTERVAL]) for device_id in read_plan
+    }
+    budget = plan_budget(
+        read_plan,
+        t_char,
+        budget_conf[CONF_BUDGET_TURNAROUND] / 1000,
+        poll_intervals,
+        budget_conf[CONF_BUDGET_WRITE_RESERVE],
+        budget_conf[CONF_BUDGET_TARGET],
+    )
+    if not budget["ok"]:
+        message = (
+            f"Polling needs {budget['utilization']:.0%} of the bus at {conf[CONF_BAUDRATE]} baud "
+            f"(target {budget_conf[CONF_BUDGET_TARGET]:.0%} including {budget_conf[CONF_BUDGET_WRITE_RESERVE]:.0%} "
+            f"reserved for writes); minimal safe poll_interval is {budget['min_interval']} s for all slaves"
+        )
+        if budget_conf[CONF_BUDGET_MODE] == BUDGET_MODE_REFUSE:
+            _LOGGER.error(f"{message}: refusing to start")
+            return False
+        if budget_conf[CONF_BUDGET_MODE] == BUDGET_MODE_AUTO and budget["min_interval"] != float("inf"):
+            # Intervalle minimal propre à chaque automate, selon son temps de cycle
+            poll_intervals = {device_id: slave["suggested_interval"] for device_id, slave in budget["slaves"].items()}
+            _LOGGER.warning(f"{message}: using per-slave poll intervals {poll_intervals}")
+        else:
+            _LOGGER.warning(message)
+    else:
+        _LOGGER.info(f"Bus budget: polling uses {budget['utilization']:.0%} of the bus (cycle {budget['cycle_ms']} ms)")
+    hass.data[DOMAIN]["poll_intervals"] = poll_intervals
     
-    # Lancer la boucle d'update automatique (toutes les 2 secondes, comme scripts.js)
-    async def update_loop():
-        """Boucle d'update automatique pour tous les relais (lecture groupée par automate)."""
-        while True:
-            try:
-                await asyncio.sleep(2)                              # Update toutes les 2 secondes
-                entities = hass.data[DOMAIN].get("entities", [])
-                relays_config = hass.data[DOMAIN]["relays"]
-                
-                # Grouper les relais par device_id pour lecturer en masse
-                relays_by_device = {}
-                for relay_conf in relays_config:
-                    device_id = relay_conf.get(CONF_RELAY_DEVICE_ID, conf[CONF_SLAVE_ID])
-                    if device_id not in relays_by_device:
-                        relays_by_device[device_id] = []
-                    relays_by_device[device_id].append(relay_conf)
-                
-                # Lire les états par automate (holding register 0x0613 contient les 16 bits Q+Y)
-                for device_id, relays in relays_by_device.items():
-                    # Lire le holding register 0x0613 qui contient tous les états (comme scripts.js)
-                    bits = await hass.async_add_executor_job(
-                        client.read_coils_bulk, 0x0613, 16, device_id
-                    )
-                    
-                    if bits:
-                        # Mettre à jour tous les relais de cet automate
-                        for entity in entities:
-                            # Vérifier si le relais appartient à cet automate
-                            if entity.device_id == device_id:
-                                # Extraire le bit correspondant au read_address
-                                read_addr = entity.read_address
-                                # Conversion: 0x0000-0x0007 = index 0-7, 0x0010-0x0017 = index 8-15
-                                if read_addr <= 0x0007:
-                                    bit_index = read_addr
-                                elif read_addr >= 0x0010 and read_addr <= 0x0017:
-                                    bit_index = 8 + (read_addr - 0x0010)
-                                else:
-                                    _LOGGER.warning(f"Unknown read_address {read_addr:04X} for {entity._attr_name}")
-                                    continue
-                                
-                                if bit_index < len(bits):
-                                    entity._state = bool(bits[bit_index])
-                                    entity.async_write_ha_state()
-                                    _LOGGER.debug(f"Updated {entity._attr_name}: {entity._state}")
-                    
-            except Exception as e:
-                _LOGGER.error(f"Error in update loop: {e}", exc_info=True)
-    
-    hass.async_create_task(update_loop())
-    
+    def update_entities(device_id: int, since: float) -> None:
+        """Mettre à jour les entités d'un automate depuis les registres lus après 'since'."""
+        entities = hass.data[DOMAIN].get("entities", [])
+        light_entities = hass.data[DOMAIN].get("light_entities", [])
+        sensor_entities = hass.data[DOMAIN].get("sensor_entities", [])
+        history: OutputHistory = hass.data[DOMAIN]["history"]
+        wall_clock = time.time()
+
+        # Holding register 0x0613: contient tous les états Q+Y (comme scripts.js)
+        state = cache.get(device_id, REGISTER_HOLDING, OUTPUT_STATE_REGISTER)
+        if state is not None and state[1] >= since:
+            register_value = state[0][0]
+            history.record(device_id, OUTPUT_STATE_REGISTER, register_value, wall_clock)
+            bits = [(register_value & (1 << i)) != 0 for i in range(16)]
+            # Mettre à jour tous les relais de cet automate
+            for entity in entities:
+                # Vérifier si le relais appartient à cet automate
+                if entity.device_id == device_id:
+                    # Extraire le bit correspondant au read_address
+                    read_addr = entity.read_address
+                    bit_index = output_bit_index(read_addr)
+                    if bit_index is None:
+                        _LOGGER.warning(f"Unknown read_address {read_addr:04X} for {entity._attr_name}")
+                        continue
+
+                    if bit_index < len(bits):
+                        entity._state = bool(bits[bit_index])
+                        entity.async_write_ha_state()
+                        _LOGGER.debug(f"Updated {entity._attr_name}: {entity._state}")
+
+        # Lumières (bobines télérupteur): bit "position" de leur registre d'état
+        for light in light_entities:
+            if light.device_id != device_id:
+                continue
+            cached = cache.get(device_id, REGISTER_HOLDING, light.read_address)
+            if cached is not None and cached[1] >= since:
+                history.record(device_id, light.read_address, cached[0][0], wall_clock)
+                light._state = bool(cached[0][0] & (1 << light.position))
+                light.async_write_ha_state()
+
+        # Capteurs analogiques: bande morte et intervalle minimum gérés par l'entité
+        now = time.monotonic()
+        for sensor in sensor_entities:
+            if sensor.device_id != device_id:
+                continue
+            cached = cache.get(device_id, sensor.register_type, sensor.address, sensor.count)
+            if cached is not None and cached[1] >= since:
+                sensor.handle_registers(cached[0], now)
+
+    # Lecture cyclique (toutes les 2 secondes par défaut, comme scripts.js), un intervalle par automate
+    poller = Poller(bus, cache, read_plan, poll_intervals, update_entities)
+    hass.data[DOMAIN]["poller"] = poller
+
     # Service pour écrire une bobine
     async def write_coil_service(call: ServiceCall) -> None:
         """Service pour écrire une bobine."""
         address = call.data.get("address")
         state = call.data.get("state")
+        device_id = call.data.get("device_id", conf[CONF_SLAVE_ID])
         
         try:
-            await hass.async_add_executor_job(
-                client.write_coil, address, state
-            )
-            _LOGGER.info(f"Wrote coil {address:04X} = {state}")
+            # Passe par le filtre des commandes: fusion des rafales et limite par automate
+            if await commands.write_coil(address, state, device_id):
+                _LOGGER.info(f"Wrote coil {address:04X} = {state}")
         except Exception as e:
             _LOGGER.error(f"Failed to write coil: {e}")
     
@@ -207,9 +442,287 @@ async def async_setup(hass: HomeAssistant, config: dict) -> bool:
         schema=vol.Schema({
             vol.Required("address"): cv.positive_int,
             vol.Required("state"): cv.boolean,
+            vol.Optional("device_id"): cv.positive_int,
         })
     )
-    
+
+    # Service pour écrire un registre de commande et relire l'état des sorties (FC23 si supporté)
+    async def write_register_service(call: ServiceCall) -> ServiceResponse:
+        """Écrire un registre et retourner la plage d'état relue après l'écriture."""
+        device_id = call.data.get("device_id", conf[CONF_SLAVE_ID])
+        read_address = call.data.get("read_address", OUTPUT_STATE_REGISTER)
+        write_start = time.monotonic()
+        registers = await commands.write_register(
+            call.data["address"], call.data["value"], device_id, read_address, call.data["read_count"]
+        )
+        if registers is None:
+            raise HomeAssistantError(f"Failed to write register {call.data['address']:04X} on slave {device_id}")
+        # La plage d'état relue rafraîchit directement les entités de l'automate
+        if device_id in read_plan:
+            update_entities(device_id, write_start)
+        return {"registers": registers}
+
+    hass.services.async_register(
+        DOMAIN,
+        "write_register",
+        write_register_service,
+        schema=vol.Schema({
+            vol.Required("address"): cv.positive_int,
+            vol.Required("value"): vol.All(vol.Coerce(int), vol.Range(min=0, max=0xFFFF)),
+            vol.Optional("device_id"): cv.positive_int,
+            vol.Optional("read_address"): cv.positive_int,                  # Registre d'état (défaut 0x0613)
+            vol.Optional("read_count", default=1): vol.All(vol.Coerce(int), vol.Range(min=1, max=125)),
+        }),
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+
+    # Service broadcast: une seule trame (esclave 0) pour une bobine identique sur tous les automates
+    async def broadcast_coil_service(call: ServiceCall) -> ServiceResponse:
+        """Écrire une bobine sur tous les automates puis vérifier chaque automate une fois."""
+        address = call.data["address"]
+        state = call.data["state"]
+        device_ids = call.data.get("device_ids") or list(read_plan)
+        read_address = call.data.get("read_address")
+        state_bit = output_bit_index(read_address) if read_address is not None else None
+
+        verify_start = time.monotonic()
+        results = await commands.broadcast_coil(
+            address, state, device_ids, conf[CONF_BROADCAST_SETTLE], state_bit
+        )
+        # Les lectures de vérification rafraîchissent directement les entités
+        for device_id in device_ids:
+            update_entities(device_id, verify_start)
+        _LOGGER.info(f"Broadcast coil {address:04X} = {state}: {results}")
+        return {"results": {str(device_id): result for device_id, result in results.items()}}
+
+    hass.services.async_register(
+        DOMAIN,
+        "broadcast_coil",
+        broadcast_coil_service,
+        schema=vol.Schema({
+            vol.Required("address"): cv.positive_int,
+            vol.Required("state"): cv.boolean,
+            vol.Optional("device_ids"): vol.All(cv.ensure_list, [cv.positive_int]),
+            vol.Optional("read_address"): cv.positive_int,     # Sortie à vérifier (0x0000-0x0017)
+        }),
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+
+    # Service retournant les compteurs de commutation (historique en mémoire, sans accès au bus)
+    async def output_stats_service(call: ServiceCall) -> ServiceResponse:
+        """Retourner nombre de commutations, temps ON et taux d'utilisation des sorties."""
+        device_id = call.data.get("device_id", conf[CONF_SLAVE_ID])
+        address = call.data.get("address", OUTPUT_STATE_REGISTER)
+        position = call.data.get("position")
+        transitions = call.data.get("transitions", 0)
+
+        word_history = hass.data[DOMAIN]["history"].get(device_id, address)
+        if word_history is None:
+            return {"outputs": {}}
+        now = time.time()
+        bits = [position] if position is not None else range(BITS_PER_WORD)
+        outputs = {}
+        for bit in bits:
+            outputs[str(bit)] = word_history.stats(bit, now)
+            if transitions:
+                outputs[str(bit)]["transitions"] = [
+                    {"time": dt_util.utc_from_timestamp(ts).isoformat(), "state": bool(word & (1 << bit))}
+                    for ts, word, _ in word_history.transitions(bit, transitions)
+                ]
+        return {"outputs": outputs}
+
+    hass.services.async_register(
+        DOMAIN,
+        "output_stats",
+        output_stats_service,
+        schema=vol.Schema({
+            vol.Optional("device_id"): cv.positive_int,
+            vol.Optional("address"): cv.positive_int,                       # Registre d'état (défaut 0x0613)
+            vol.Optional("position"): vol.All(vol.Coerce(int), vol.Range(min=0, max=15)),
+            vol.Optional("transitions", default=0): vol.All(vol.Coerce(int), vol.Range(min=0)),
+        }),
+        supports_response=SupportsResponse.ONLY,
+    )
+
+    # Service retournant le budget de temps du bus (détail par automate)
+    async def bus_budget_service(call: ServiceCall) -> ServiceResponse:
+        """Recalculer le budget du bus avec le temps de réponse mesuré des automates."""
+        measured = measured_turnaround(read_plan, t_char, bus.stats["avg_duration"].get(PRIORITY_POLL))
+        turnaround = measured if measured is not None else budget_conf[CONF_BUDGET_TURNAROUND] / 1000
+        report = plan_budget(
+            read_plan,
+            t_char,
+            turnaround,
+            poll_intervals,
+            budget_conf[CONF_BUDGET_WRITE_RESERVE],
+            budget_conf[CONF_BUDGET_TARGET],
+        )
+        report["turnaround_measured"] = measured is not None
+        report["slaves"] = {str(device_id): slave for device_id, slave in report["slaves"].items()}
+        report["bus_busy_time"] = round(bus.stats["busy_time"], 3)
+        if report["min_interval"] == float("inf"):
+            report["min_interval"] = None
+            for slave in report["slaves"].values():
+                slave["suggested_interval"] = None
+        return report
+
+    hass.services.async_register(
+        DOMAIN,
+        "bus_budget",
+        bus_budget_service,
+        schema=vol.Schema({}),
+        supports_response=SupportsResponse.ONLY,
+    )
+
+    # Service retournant les compteurs du chemin des commandes
+    async def command_stats_service(call: ServiceCall) -> ServiceResponse:
+        """Retourner les écritures envoyées, ignorées, fusionnées et limitées, et les séquences."""
+        return {
+            **commands.stats,
+            "fc23_support": {str(device_id): supported for device_id, supported in commands.fc23_support.items()},
+            "sequences": dict(sequences.stats),
+            "running_sequences": sequences.running,
+        }
+
+    hass.services.async_register(
+        DOMAIN,
+        "command_stats",
+        command_stats_service,
+        schema=vol.Schema({}),
+        supports_response=SupportsResponse.ONLY,
+    )
+
+    async def run_sequence(call: ServiceCall, steps: list[CoilStep]) -> ServiceResponse:
+        """Démarrer une séquence; avec wait, attendre la fin et retourner les instants réels des écritures."""
+        try:
+            sequence_id, task = await sequences.start(steps, call.data.get("sequence_id"))
+        except ValueError as e:
+            raise HomeAssistantError(str(e)) from e
+        if not call.data["wait"]:
+            return {"sequence_id": sequence_id}
+        # L'annulation de l'appel de service n'interrompt pas la séquence
+        return await asyncio.shield(task)
+
+    # Service impulsion: ON pendant duration, répété count fois (portail, sonnette, volet)
+    async def pulse_service(call: ServiceCall) -> ServiceResponse:
+        """Envoyer une impulsion (ou un train d'impulsions) minutée par l'intégration."""
+        steps = pulse_steps(
+            call.data["address"],
+            call.data.get("device_id", conf[CONF_SLAVE_ID]),
+            call.data["duration"],
+            call.data["count"],
+            call.data.get("interval"),
+        )
+        return await run_sequence(call, steps)
+
+    hass.services.async_register(
+        DOMAIN,
+        "pulse",
+        pulse_service,
+        schema=vol.Schema({
+            vol.Required("address"): cv.positive_int,
+            vol.Optional("device_id"): cv.positive_int,
+            vol.Required("duration"): vol.All(vol.Coerce(float), vol.Range(min=0.01)),
+            vol.Optional("count", default=1): vol.All(vol.Coerce(int), vol.Range(min=1, max=100)),
+            vol.Optional("interval"): vol.All(vol.Coerce(float), vol.Range(min=0.01)),
+            vol.Optional("sequence_id"): cv.string,
+            vol.Optional("wait", default=False): cv.boolean,
+        }),
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+
+    # Service séquence: écritures enchaînées, chaque délai est compté depuis l'étape précédente
+    async def sequence_service(call: ServiceCall) -> ServiceResponse:
+        """Exécuter une séquence d'écritures de bobines minutée par l'intégration."""
+        steps = []
+        offset = 0.0
+        for step in call.data["steps"]:
+            offset += step["delay"]
+            steps.append(CoilStep(offset, step["address"], step["state"], step.get("device_id", conf[CONF_SLAVE_ID])))
+        return await run_sequence(call, steps)
+
+    hass.services.async_register(
+        DOMAIN,
+        "sequence",
+        sequence_service,
+        schema=vol.Schema({
+            vol.Required("steps"): vol.All(cv.ensure_list, [SEQUENCE_STEP_SCHEMA], vol.Length(min=1)),
+            vol.Optional("sequence_id"): cv.string,
+            vol.Optional("wait", default=False): cv.boolean,
+        }),
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+
+    # Annulation: les bobines laissées actives par la séquence sont coupées
+    async def cancel_sequence_service(call: ServiceCall) -> ServiceResponse:
+        """Annuler une séquence (toutes si aucun identifiant n'est donné)."""
+        return {"cancelled": await sequences.cancel(call.data.get("sequence_id"))}
+
+    hass.services.async_register(
+        DOMAIN,
+        "cancel_sequence",
+        cancel_sequence_service,
+        schema=vol.Schema({
+            vol.Optional("sequence_id"): cv.string,
+        }),
+        supports_response=SupportsResponse.OPTIONAL,
+    )
+
+    async def async_start_bus(_hass: HomeAssistant) -> None:
+        """Ouvrir le port série, lancer l'ordonnanceur et la lecture une fois Home Assistant démarré."""
+        with profiler.span("import"):
+            await hass.async_add_executor_job(client.prepare)
+        with profiler.span("port_open"):
+            connected = await hass.async_add_executor_job(client.connect)
+        if connected:
+            _LOGGER.info(f"Connected to IMO device on {conf[CONF_PORT]}")
+        else:
+            # Le client retente la connexion à chaque transaction
+            _LOGGER.error(f"Failed to connect to IMO device on {conf[CONF_PORT]}")
+        bus.start()
+
+        # Proxy Modbus TCP (optionnel)
+        if CONF_PROXY in conf:
+            proxy_conf = conf[CONF_PROXY]
+            proxy = ModbusTCPProxy(
+                bus=bus,
+                cache=hass.data[DOMAIN]["cache"],
+                host=proxy_conf[CONF_PROXY_HOST],
+                port=proxy_conf[CONF_PROXY_PORT],
+                max_cache_age=proxy_conf[CONF_PROXY_MAX_CACHE_AGE],
+                rate_limit=proxy_conf[CONF_PROXY_RATE_LIMIT],
+                burst=proxy_conf[CONF_PROXY_BURST],
+                commands=commands,
+            )
+            try:
+                await proxy.async_start()
+                hass.data[DOMAIN]["proxy"] = proxy
+            except OSError as e:
+                _LOGGER.error(f"Failed to start Modbus TCP proxy on port {proxy_conf[CONF_PROXY_PORT]}: {e}")
+
+        # Première lecture de tous les automates: les entités créées depuis la config reçoivent leur état
+        with profiler.span("first_read"):
+            for device_id in read_plan:
+                try:
+                    await poller.poll_device(device_id)
+                except Exception as e:
+                    _LOGGER.error(f"Error reading slave {device_id}: {e}", exc_info=True)
+        hass.data[DOMAIN]["startup_timings"] = profiler.report()
+        hass.async_create_task(poller.run())
+
+    async_at_started(hass, async_start_bus)
+
+    async def async_shutdown(event: Event) -> None:
+        """Arrêter le proxy, les séquences et l'ordonnanceur du bus à l'arrêt de Home Assistant."""
+        proxy = hass.data[DOMAIN].get("proxy")
+        if proxy is not None:
+            await proxy.async_stop()
+        # Les séquences en cours coupent leurs bobines tant que le bus tourne encore
+        await sequences.stop()
+        await bus.stop()
+
+    hass.bus.async_listen_once(EVENT_HOMEASSISTANT_STOP, async_shutdown)
+
     # Charger la plateforme switch
     hass.async_create_task(
         async_load_platform(hass, Platform.SWITCH, DOMAIN, {}, config)
@@ -220,4 +733,11 @@ async def async_setup(hass: HomeAssistant, config: dict) -> bool:
         async_load_platform(hass, Platform.LIGHT, DOMAIN, {}, config)
     )
 
+    # Charger la plateforme sensor (registres analogiques)
+    if conf[CONF_SENSORS]:
+        hass.async_create_task(
+            async_load_platform(hass, Platform.SENSOR, DOMAIN, {}, config)
+        )
+
+    profiler.add("setup", time.monotonic() - setup_start)
     return True
@@ -0,0 +1,148 @@
+"""Budget de temps du bus RS485: validation de la configuration et intervalles de lecture sûrs."""
+from __future__ import annotations
+
+import math
+
+from .read_plan import ReadSpan
+
+# Taille des trames Modbus RTU (octets, CRC compris)
+READ_REQUEST_BYTES = 8          # esclave, fonction, adresse (2), nombre (2), CRC (2)
+READ_RESPONSE_OVERHEAD = 5      # esclave, fonction, nombre d'octets, CRC (2)
+INTER_FRAME_CHARS = 3.5         # Silence minimal entre deux trames RTU
+
+
+def char_time(baudrate: int, bytesize: int = 8, parity: str = "N", stopbits: int = 1) -> float:
+    """Durée (s) de transmission d'un caractère: start + données + parité + stop."""
+    bits = 1 + bytesize + (0 if parity == "N" else 1) + stopbits
+    return bits / baudrate
+
+
+def span_time(span: ReadSpan, t_char: float, turnaround: float) -> float:
+    """Durée (s) d'une lecture de plage: requête + réponse + silences + temps de réponse de l'esclave."""
+    frame_chars = READ_REQUEST_BYTES + READ_RESPONSE_OVERHEAD + 2 * span.count + 2 * INTER_FRAME_CHARS
+    return frame_chars * t_char + turnaround
+
+
+def fair_intervals(cycles: dict[int, float], poll_intervals: dict[int, float], available: float) -> dict[int, float]:
+    """
+    Intervalles de lecture minimaux par automate qui tiennent dans la part de bus disponible.
+
+    Chaque automate a droit à une part égale de la part disponible; un automate qui
+    consomme moins que sa part à son intervalle configuré le garde, et sa part non
+    utilisée est redistribuée aux autres. Les autres reçoivent l'intervalle minimal
+    correspondant à leur part (temps de cycle / part), arrondi au dixième de seconde
+    supérieur: un automate peu chargé reste lu aussi souvent que possible.
+
+    Args:
+        cycles: Temps de cycle (s) de chaque automate
+        poll_intervals: Intervalle configuré (s) de chaque automate
+        available: Part du bus disponible pour la lecture cyclique (0-1)
+
+    Returns:
+        dict: Intervalle suggéré (s) par automate (infini si aucune part n'est disponible)
+    """
+    if available <= 0:
+        return {device_id: math.inf for device_id in cycles}
+    suggested = {}
+    remaining = available
+    pending = dict(cycles)
+    while pending:
+        share = remaining / len(pending)
+        keep = [
+            device_id for device_id, cycle in pending.items()
+            if cycle / poll_intervals[device_id] <= share
+        ]
+        if not keep:
+            for device_id, cycle in pending.items():
+                suggested[device_id] = max(poll_intervals[device_id], math.ceil(cycle / share * 10) / 10)
+            break
+        for device_id in keep:
+            suggested[device_id] = poll_intervals[device_id]
+            remaining -= pending.pop(device_id) / poll_intervals[device_id]
+    return suggested
+
+
+def plan_budget(
+    read_plan: dict[int, list[ReadSpan]],
+    t_char: float,
+    turnaround: float,
+    poll_intervals: dict[int, float],
+    write_reserve: float,
+    target_utilization: float,
+) -> dict:
+    """
+    Calculer le temps de bus consommé par la lecture cyclique.
+
+    Le bus est sain si la somme des (temps de cycle / intervalle) de chaque
+    automate, plus la part réservée aux écritures, ne dépasse pas l'utilisation
+    cible. Sinon, un intervalle minimal est proposé pour chaque automate (voir
+    fair_intervals()), ainsi que l'intervalle minimal commun à tous les automates.
+
+    Args:
+        read_plan: Plan de lecture compilé {device_id: [ReadSpan, ...]}
+        t_char: Durée d'un caractère (s), voir char_time()
+        turnaround: Temps de réponse d'un esclave (s)
+        poll_intervals: Intervalle de lecture appliqué (s) de chaque automate
+        write_reserve: Part du bus réservée aux écritures (0-1)
+        target_utilization: Utilisation maximale visée (0-1)
+
+    Returns:
+        dict: Détail par automate, totaux et intervalles suggérés
+    """
+    cycles = {
+        device_id: sum(span_time(span, t_char, turnaround) for span in spans)
+        for device_id, spans in read_plan.items()
+    }
+    total_cycle = sum(cycles.values())
+
+    available = target_utilization - write_reserve
+    if available <= 0:
+        min_interval = math.inf
+    else:
+        # Intervalle commun minimal, arrondi au dixième de seconde supérieur
+        min_interval = math.ceil(total_cycle / available * 10) / 10
+    suggested = fair_intervals(cycles, poll_intervals, available)
+
+    slaves = {}
+    utilization = write_reserve
+    for device_id, spans in read_plan.items():
+        cycle = cycles[device_id]
+        utilization += cycle / poll_intervals[device_id]
+        slaves[device_id] = {
+            "frames": len(spans),
+            "registers": sum(span.count for span in spans),
+            "cycle_ms": round(cycle * 1000, 2),
+            "poll_interval": poll_intervals[device_id],
+            "utilization": round(cycle / poll_intervals[device_id], 4),
+            "suggested_interval": suggested[device_id],
+        }
+
+    return {
+        "slaves": slaves,
+        "char_time_us": round(t_char * 1e6, 1),
+        "turnaround_ms": round(turnaround * 1000, 2),
+        "cycle_ms": round(total_cycle * 1000, 2),
+        "write_reserve": write_reserve,
+        "target_utilization": target_utilization,
+        "utilization": round(utilization, 4),
+        "ok": utilization <= target_utilization,
+        "min_interval": min_interval,
+    }
+
+
+def measured_turnaround(
+    read_plan: dict[int, list[ReadSpan]],
+    t_char: float,
+    avg_poll_duration: float | None,
+) -> float | None:
+    """
+    Estimer le temps de réponse réel des esclaves à partir de la durée moyenne mesurée des lectures.
+
+    Returns:
+        float ou None: turnaround (s), None sans mesure disponible
+    """
+    spans = [span for spans in read_plan.values() for span in spans]
+    if not spans or avg_poll_duration is None:
+        return None
+    avg_wire = sum(span_time(span, t_char, 0.0) for span in spans) / len(spans)
+    return max(0.0, avg_poll_duration - avg_wire)
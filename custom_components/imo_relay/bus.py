@@ -0,0 +1,127 @@
+"""Ordonnanceur du bus RS485 partagé par les entités, la boucle de lecture et le proxy TCP."""
+from __future__ import annotations
+
+import asyncio
+import itertools
+import logging
+import time
+from typing import Any, Callable
+
+from homeassistant.core import HomeAssistant
+
+from .modbus_client import ModbusRTUClient
+
+_LOGGER = logging.getLogger(__name__)
+
+# Priorités des transactions (plus petit = plus prioritaire)
+PRIORITY_COMMAND = 0    # Commandes Home Assistant (switch, light, services)
+PRIORITY_POLL = 1       # Boucle de lecture groupée
+PRIORITY_PROXY = 2      # Trafic des clients tiers via le proxy Modbus TCP
+
+
+class TokenBucket:
+    """Limiteur de débit à seau de jetons (rate jetons/s, au plus burst jetons en réserve)."""
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.capacity = burst
+        self._tokens = float(burst)
+        self._stamp = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._stamp) * self.rate)
+        self._stamp = now
+
+    def try_acquire(self, now: float | None = None) -> bool:
+        """Consommer un jeton si disponible."""
+        self._refill(time.monotonic() if now is None else now)
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return True
+        return False
+
+    def delay(self, now: float | None = None) -> float:
+        """Secondes à attendre avant qu'un jeton soit disponible."""
+        self._refill(time.monotonic() if now is None else now)
+        if self._tokens >= 1:
+            return 0.0
+        if self.rate <= 0:
+            return float("inf")
+        return (1 - self._tokens) / self.rate
+
+
+class ModbusBus:
+    """
+    Sérialise toutes les transactions Modbus sur le port série.
+
+    Une seule transaction est en cours à la fois; les suivantes sont servies par
+    ordre de priorité puis d'arrivée. Les fonctions du client (bloquantes) sont
+    exécutées dans l'executor de Home Assistant.
+    """
+
+    def __init__(self, hass: HomeAssistant, client: ModbusRTUClient):
+        self.hass = hass
+        self.client = client
+        self._queue: asyncio.PriorityQueue = asyncio.PriorityQueue()
+        self._seq = itertools.count()
+        self._worker: asyncio.Task | None = None
+        self.stats = {
+            "transactions": {PRIORITY_COMMAND: 0, PRIORITY_POLL: 0, PRIORITY_PROXY: 0},
+            "busy_time": 0.0,   # Temps cumulé passé sur le bus (secondes)
+            "avg_duration": {},  # Durée moyenne (moyenne glissante) d'une transaction, par priorité
+        }
+
+    def start(self) -> None:
+        """Démarrer la tâche qui exécute les transactions."""
+        if self._worker is None:
+            self._worker = self.hass.async_create_task(self._run())
+
+    async def stop(self) -> None:
+        """Arrêter la tâche; la transaction en cours et celles en attente sont annulées."""
+        if self._worker is not None:
+            self._worker.cancel()
+            self._worker = None
+        while not self._queue.empty():
+            *_, future = self._queue.get_nowait()
+            if not future.done():
+                future.cancel()
+
+    async def execute(self, func: Callable[..., Any], *args: Any, priority: int = PRIORITY_POLL) -> Any:
+        """
+        Exécuter une fonction du client sur le bus et attendre son résultat.
+
+        Args:
+            func: Méthode bloquante du client (ex: client.write_coil)
+            args: Arguments de la méthode
+            priority: PRIORITY_COMMAND, PRIORITY_POLL ou PRIORITY_PROXY
+        """
+        future = self.hass.loop.create_future()
+        self._queue.put_nowait((priority, next(self._seq), func, args, future))
+        return await future
+
+    async def _run(self) -> None:
+        """Boucle d'exécution des transactions, une à la fois."""
+        while True:
+            priority, _, func, args, future = await self._queue.get()
+            if future.cancelled():
+                continue
+            start = time.monotonic()
+            try:
+                result = await self.hass.async_add_executor_job(func, *args)
+            except asyncio.CancelledError:
+                # Arrêt du bus pendant la transaction: ne pas laisser l'appelant attendre indéfiniment
+                if not future.done():
+                    future.cancel()
+                raise
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+            else:
+                if not future.done():
+                    future.set_result(result)
+            finally:
+                duration = time.monotonic() - start
+                self.stats["busy_time"] += duration
+                average = self.stats["avg_duration"].get(priority)
+                self.stats["avg_duration"][priority] = duration if average is None else 0.9 * average + 0.1 * duration
+                self.stats["transactions"][priority] = self.stats["transactions"].get(priority, 0) + 1
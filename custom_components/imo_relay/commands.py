@@ -0,0 +1,501 @@
+"""Chemin des commandes: suppression des écritures redondantes et protection contre les rafales."""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+
+from .bus import PRIORITY_COMMAND, ModbusBus, TokenBucket
+from .const import FC23_UNANSWERED_LIMIT, OUTPUT_STATE_REGISTER, REGISTER_HOLDING
+from .read_plan import RegisterCache
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class _PendingWrite:
+    """Écriture différée d'une bobine: seule la dernière valeur demandée est envoyée."""
+
+    __slots__ = ("state", "future")
+
+    def __init__(self, state: bool, future: asyncio.Future):
+        self.state = state
+        self.future = future
+
+
+class _Interlock:
+    """Groupe de bobines d'un automate qui ne doivent jamais être actives en même temps."""
+
+    __slots__ = ("coils", "delay", "lock")
+
+    def __init__(self, coils: list[tuple[int, int]], delay: float):
+        self.coils = coils
+        self.delay = delay
+        self.lock = asyncio.Lock()
+
+
+class CommandFilter:
+    """
+    Filtre les écritures de bobines avant de les envoyer sur le bus.
+
+    - Une écriture dont la valeur correspond déjà à l'état connu et récent de la
+      sortie est ignorée (si l'entité fournit le bit d'état correspondant).
+    - Les écritures répétées sur la même bobine pendant la fenêtre de regroupement
+      sont fusionnées: seule la dernière valeur est envoyée à la fin de la fenêtre.
+    - Chaque automate dispose d'un seau de jetons: au-delà, les écritures sont refusées.
+    - Avant d'activer une bobine d'un groupe d'interverrouillage, les autres bobines
+      du groupe sont coupées, puis le temps mort du groupe est respecté.
+    """
+
+    def __init__(
+        self,
+        bus: ModbusBus,
+        cache: RegisterCache,
+        window: float,
+        rate_limit: float,
+        burst: int,
+        state_max_age: float,
+        max_wait: float = 1.0,
+        verify_delay: float = 0.3,
+        interlocks: list[tuple[int, list[int], float]] | None = None,
+    ):
+        self.bus = bus
+        self.cache = cache
+        self.window = window
+        self.rate_limit = rate_limit
+        self.burst = burst
+        self.state_max_age = state_max_age
+        self.max_wait = max_wait
+        self.verify_delay = verify_delay
+        self._toggle_locks: dict[tuple[int, int], asyncio.Lock] = {}
+        self._buckets: dict[int, TokenBucket] = {}
+        self._last_sent: dict[tuple[int, int], tuple[bool, float]] = {}    # (slave, bobine) -> (valeur, horodatage)
+        self._last_write: dict[int, float] = {}                           # slave -> fin de la dernière écriture
+        self._in_flight: dict[int, int] = {}                              # slave -> écritures en cours
+        self._pending: dict[tuple[int, int], _PendingWrite] = {}
+        self._fc23: dict[int, bool] = {}                                  # slave -> FC23 supporté (absent: inconnu)
+        self._fc23_unanswered: dict[int, int] = {}                        # slave -> FC23 sans réponse, support inconnu
+        # (slave, bobine) -> groupe d'interverrouillage
+        self._interlocks: dict[tuple[int, int], _Interlock] = {}
+        for device_id, coils, delay in interlocks or []:
+            group = _Interlock([(device_id, coil) for coil in coils], delay)
+            for key in group.coils:
+                self._interlocks[key] = group
+        self.stats = {
+            "sent": 0,
+            "suppressed": 0,        # Écritures inutiles (état déjà atteint)
+            "collapsed": 0,         # Écritures fusionnées avec une écriture plus récente
+            "rate_limited": 0,      # Écritures refusées par le limiteur
+            "failed": 0,
+            "toggle_retries": 0,    # Impulsions répétées après une vérification en échec
+            "broadcasts": 0,
+            "broadcast_fallbacks": 0,   # Automates rattrapés en unicast après un broadcast
+            "interlock_releases": 0,    # Bobines coupées avant l'activation d'une bobine interverrouillée
+            "register_writes": 0,       # Écritures de registre vérifiées
+            "fc23": 0,                  # ... dont écriture + lecture en une seule transaction (FC23)
+            "fc23_fallbacks": 0,        # ... dont écriture puis lecture séparées (FC23 non supporté)
+        }
+
+    def interlocked_with(self, device_id: int, address: int) -> list[int]:
+        """Autres bobines du groupe d'interverrouillage de cette bobine (liste vide si aucun)."""
+        group = self._interlocks.get((device_id, address))
+        if group is None:
+            return []
+        return [coil for slave, coil in group.coils if (slave, coil) != (device_id, address)]
+
+    def sent_at(self, device_id: int, address: int) -> float | None:
+        """Début (monotonic) de la dernière écriture envoyée sur cette bobine, après l'attente d'interverrouillage."""
+        last = self._last_sent.get((device_id, address))
+        return None if last is None else last[1]
+
+    def known_state(self, device_id: int, bit_index: int, address: int = OUTPUT_STATE_REGISTER) -> bool | None:
+        """
+        État d'une sortie d'après un registre d'état en cache (0x0613 par défaut).
+
+        Retourne None si la valeur est trop ancienne ou antérieure à la dernière
+        écriture sur cet automate (elle ne reflète alors pas forcément la commande).
+        """
+        if self._in_flight.get(device_id):
+            return None
+        cached = self.cache.get(device_id, REGISTER_HOLDING, address)
+        if cached is None:
+            return None
+        registers, timestamp = cached
+        if time.monotonic() - timestamp > self.state_max_age or timestamp <= self._last_write.get(device_id, 0.0):
+            return None
+        return bool(registers[0] & (1 << bit_index))
+
+    async def write_coil(self, address: int, state: bool, device_id: int, state_bit: int | None = None) -> bool:
+        """
+        Écrire une bobine à travers le filtre.
+
+        Args:
+            address: Adresse de la bobine
+            state: Valeur souhaitée
+            device_id: Esclave Modbus
+            state_bit: Bit du registre 0x0613 reflétant la sortie; si fourni, l'écriture
+                est ignorée quand l'état connu correspond déjà à la valeur souhaitée
+
+        Returns:
+            bool: True si la sortie est (ou sera) dans l'état demandé, False sinon
+        """
+        key = (device_id, address)
+        pending = self._pending.get(key)
+        if pending is not None:
+            # Une écriture est déjà programmée pour cette bobine: on remplace sa valeur
+            # (avant le test de redondance: l'état connu ne tient pas compte de l'écriture programmée)
+            pending.state = state
+            self.stats["collapsed"] += 1
+            return await asyncio.shield(pending.future)
+
+        if state_bit is not None and self.known_state(device_id, state_bit) == state:
+            self.stats["suppressed"] += 1
+            _LOGGER.debug(f"Skipping redundant write {address:04X} = {state} on slave {device_id}")
+            return True
+
+        last = self._last_sent.get(key)
+        now = time.monotonic()
+        if last is None or now - last[1] >= self.window:
+            return await self._send(address, state, device_id)
+
+        # Écriture trop rapprochée de la précédente: on la diffère à la fin de la fenêtre
+        pending = _PendingWrite(state, self.bus.hass.loop.create_future())
+        self._pending[key] = pending
+        self.bus.hass.async_create_task(self._send_later(key, address, device_id, last[1] + self.window - now))
+        return await asyncio.shield(pending.future)
+
+    async def _read_state(self, device_id: int, read_address: int, position: int) -> bool | None:
+        """Lecture ciblée du registre d'état (priorité commande), mémorisée dans le cache."""
+        registers = await self.bus.execute(
+            self.bus.client.read_registers, read_address, 1, device_id, False, priority=PRIORITY_COMMAND
+        )
+        if registers is None:
+            return None
+        self.cache.update(device_id, REGISTER_HOLDING, read_address, registers, time.monotonic())
+        return bool(registers[0] & (1 << position))
+
+    async def toggle_coil(
+        self,
+        address: int,
+        device_id: int,
+        read_address: int,
+        position: int,
+        target: bool,
+    ) -> bool | None:
+        """
+        Amener une sortie commandée par bobine télérupteur (toggle) dans l'état voulu.
+
+        Chaque écriture inverse la sortie: l'état courant est donc vérifié avant
+        l'impulsion (cache récent ou lecture ciblée), les impulsions sont
+        sérialisées par bobine, et le résultat est contrôlé par une lecture
+        ciblée, avec une seule nouvelle impulsion en cas de désaccord.
+
+        Args:
+            address: Adresse de la bobine télérupteur
+            device_id: Esclave Modbus
+            read_address: Registre contenant l'état de la sortie
+            position: Position du bit d'état dans ce registre
+            target: État souhaité
+
+        Returns:
+            bool ou None: État lu après la commande, None s'il n'a pas pu être lu
+        """
+        key = (device_id, address)
+        lock = self._toggle_locks.get(key)
+        if lock is None:
+            lock = self._toggle_locks[key] = asyncio.Lock()
+
+        async with lock:
+            state = self.known_state(device_id, position, read_address)
+            if state is None:
+                state = await self._read_state(device_id, read_address, position)
+                if state is None:
+                    # Sans état connu, une impulsion risquerait d'inverser la sortie
+                    _LOGGER.error(f"Cannot read state of toggle coil {address:04X} on slave {device_id}, command skipped")
+                    return None
+
+            for attempt in range(2):
+                if state == target:
+                    if attempt == 0:
+                        self.stats["suppressed"] += 1
+                    return state
+                if attempt == 1:
+                    self.stats["toggle_retries"] += 1
+                    _LOGGER.warning(f"Toggle coil {address:04X} on slave {device_id} did not switch, retrying once")
+                if not await self._send(address, True, device_id):
+                    return state
+                # Laisser l'automate prendre en compte l'impulsion avant de vérifier
+                await asyncio.sleep(self.verify_delay)
+                state = await self._read_state(device_id, read_address, position)
+                if state is None:
+                    return None
+
+            if state != target:
+                _LOGGER.error(f"Toggle coil {address:04X} on slave {device_id} still {state} after retry")
+            return state
+
+    async def broadcast_coil(
+        self,
+        address: int,
+        state: bool,
+        device_ids: list[int],
+        settle: float,
+        state_bit: int | None = None,
+    ) -> dict[int, bool | None]:
+        """
+        Écrire la même bobine sur tous les automates en une seule trame broadcast.
+
+        Après le temps de stabilisation, chaque automate est relu une fois (registre
+        0x0613). Si state_bit est fourni, un automate dont la sortie n'est pas dans
+        l'état demandé reçoit la commande en unicast.
+
+        Args:
+            address: Adresse de la bobine (identique sur chaque automate)
+            state: Valeur souhaitée
+            device_ids: Automates à vérifier
+            settle: Délai (s) avant la lecture de vérification
+            state_bit: Bit du registre 0x0613 reflétant la sortie
+
+        Returns:
+            dict: {device_id: True si vérifié/joignable, False si échec, None si non lu}
+        """
+        if state and any(coil == address for _, coil in self._interlocks):
+            # La trame broadcast atteint tous les automates, y compris ceux hors de device_ids:
+            # elle ne peut pas couper les bobines interverrouillées avant d'activer celle-ci
+            _LOGGER.error(f"Broadcast {address:04X} = {state} refused: coil is interlocked")
+            return {device_id: False for device_id in device_ids}
+
+        if not await self._acquire(0):
+            self.stats["rate_limited"] += 1
+            _LOGGER.warning(f"Broadcast {address:04X} = {state} dropped: rate limit exceeded")
+            return {device_id: False for device_id in device_ids}
+
+        # La trame atteint tous les automates, pas seulement ceux à vérifier: l'état en cache
+        # et la dernière valeur envoyée de chacun d'eux ne reflètent plus forcément la sortie
+        reached = set(device_ids) | self.cache.device_ids | {device_id for device_id, _ in self._last_sent}
+        for device_id in reached:
+            self._in_flight[device_id] = self._in_flight.get(device_id, 0) + 1
+        try:
+            result = await self.bus.execute(
+                self.bus.client.broadcast_coil, address, state, priority=PRIORITY_COMMAND
+            )
+        finally:
+            now = time.monotonic()
+            for device_id in reached:
+                self._in_flight[device_id] -= 1
+                self._last_write[device_id] = now
+                self._last_sent[(device_id, address)] = (state, now)
+        if not result:
+            self.stats["failed"] += 1
+            for device_id in reached:
+                self._last_sent.pop((device_id, address), None)
+            return {device_id: False for device_id in device_ids}
+        self.stats["broadcasts"] += 1
+
+        # Aucune réponse en broadcast: laisser les automates appliquer la commande puis vérifier
+        await asyncio.sleep(settle)
+        results: dict[int, bool | None] = {}
+        for device_id in device_ids:
+            current = await self._read_state(device_id, OUTPUT_STATE_REGISTER, state_bit or 0)
+            if current is None:
+                results[device_id] = None
+            elif state_bit is None or current == state:
+                results[device_id] = True
+            else:
+                _LOGGER.warning(f"Slave {device_id} missed broadcast {address:04X} = {state}, sending unicast")
+                self.stats["broadcast_fallbacks"] += 1
+                results[device_id] = await self._send(address, state, device_id)
+        return results
+
+    async def _send_later(self, key: tuple[int, int], address: int, device_id: int, delay: float) -> None:
+        """Envoyer la dernière valeur demandée à la fin de la fenêtre de regroupement."""
+        await asyncio.sleep(delay)
+        pending = self._pending.pop(key)
+        last = self._last_sent.get(key)
+        if last is not None and last[0] == pending.state:
+            # La dernière valeur demandée est celle déjà envoyée
+            self.stats["suppressed"] += 1
+            result = True
+        else:
+            try:
+                result = await self._send(address, pending.state, device_id)
+            except Exception as e:
+                _LOGGER.error(f"Error writing coil {address:04X} on slave {device_id}: {e}")
+                result = False
+        if not pending.future.done():
+            pending.future.set_result(result)
+
+    async def _acquire(self, device_id: int) -> bool:
+        """Attendre un jeton du limiteur de l'automate (au plus max_wait secondes)."""
+        bucket = self._buckets.get(device_id)
+        if bucket is None:
+            bucket = self._buckets[device_id] = TokenBucket(self.rate_limit, self.burst)
+        deadline = time.monotonic() + self.max_wait
+        while not bucket.try_acquire():
+            wait = bucket.delay()
+            if time.monotonic() + wait > deadline:
+                return False
+            await asyncio.sleep(wait)
+        return True
+
+    @property
+    def fc23_support(self) -> dict[int, bool]:
+        """Support de FC23 détecté par automate (automates jamais commandés absents)."""
+        return dict(self._fc23)
+
+    async def write_register(
+        self,
+        address: int,
+        value: int,
+        device_id: int,
+        read_address: int = OUTPUT_STATE_REGISTER,
+        read_count: int = 1,
+    ) -> list[int] | None:
+        """
+        Écrire un registre de commande et relire la plage d'état, mémorisée dans le cache.
+
+        Si l'automate supporte Read/Write Multiple Registers (FC23), l'écriture et la
+        lecture partent dans la même transaction. Le support est détecté à la première
+        commande (réponse "fonction illégale") et mémorisé par automate; sinon,
+        l'écriture (FC06) est suivie d'une lecture (FC03). Sans réponse à FC23 avant le
+        premier succès, le registre de commande est relu: la commande n'est renvoyée en
+        FC06 que s'il n'a pas pris la valeur demandée. Un automate qui ignore ainsi FC23
+        alors qu'il répond au repli est considéré comme ne supportant pas FC23 après
+        FC23_UNANSWERED_LIMIT commandes.
+
+        Args:
+            address: Registre de commande
+            value: Valeur à écrire
+            device_id: Esclave Modbus
+            read_address: Premier registre d'état à relire (0x0613 par défaut)
+            read_count: Nombre de registres d'état
+
+        Returns:
+            list ou None: Registres d'état lus après l'écriture, None si l'écriture ou la lecture a échoué
+        """
+        if not await self._acquire(device_id):
+            self.stats["rate_limited"] += 1
+            _LOGGER.warning(f"Write register {address:04X} = {value} on slave {device_id} dropped: rate limit exceeded")
+            return None
+
+        client = self.bus.client
+        unanswered = False
+        self._in_flight[device_id] = self._in_flight.get(device_id, 0) + 1
+        try:
+            if self._fc23.get(device_id, True):
+                supported, registers = await self.bus.execute(
+                    client.readwrite_registers, address, [value], read_address, read_count, device_id,
+                    priority=PRIORITY_COMMAND,
+                )
+                if supported is None:
+                    # Pas de réponse: avant le premier succès, l'automate ignore peut-être FC23
+                    # au lieu de répondre "fonction illégale"
+                    unanswered = device_id not in self._fc23
+                elif supported:
+                    if registers is not None:
+                        self._fc23[device_id] = True
+                        self.stats["fc23"] += 1
+                else:
+                    # Rien n'a été écrit: l'automate a refusé la fonction
+                    _LOGGER.info(f"Slave {device_id} does not support FC23, using write then read")
+                    self._fc23[device_id] = False
+
+            if unanswered:
+                # La réponse a pu se perdre après l'exécution de FC23: relire le registre de commande
+                # avant tout renvoi, une commande n'est jamais écrite deux fois
+                registers = None
+                current = await self.bus.execute(
+                    client.read_registers, address, 1, device_id, False, priority=PRIORITY_COMMAND
+                )
+                if current is not None and current[0] == value:
+                    # Écriture appliquée (ou valeur déjà présente): seule la relecture de l'état manque
+                    registers = await self.bus.execute(
+                        client.read_registers, read_address, read_count, device_id, False, priority=PRIORITY_COMMAND
+                    )
+                elif current is not None:
+                    # FC23 non exécuté: repli FC06 + FC03 pour cette commande
+                    registers = await self._write_then_read(address, value, device_id, read_address, read_count)
+                    if registers is not None:
+                        # L'automate répond au repli mais pas à FC23 (un automate hors ligne ne compte pas)
+                        count = self._fc23_unanswered[device_id] = self._fc23_unanswered.get(device_id, 0) + 1
+                        if count >= FC23_UNANSWERED_LIMIT:
+                            _LOGGER.info(f"Slave {device_id} never answers FC23, using write then read")
+                            self._fc23[device_id] = False
+            elif not self._fc23.get(device_id, True):
+                registers = await self._write_then_read(address, value, device_id, read_address, read_count)
+        finally:
+            self._in_flight[device_id] -= 1
+            self._last_write[device_id] = time.monotonic()
+
+        if registers is None:
+            self.stats["failed"] += 1
+            return None
+        self.stats["register_writes"] += 1
+        self.cache.update(device_id, REGISTER_HOLDING, read_address, registers, time.monotonic())
+        return registers
+
+    async def _write_then_read(
+        self, address: int, value: int, device_id: int, read_address: int, read_count: int
+    ) -> list[int] | None:
+        """Repli sans FC23: écriture du registre (FC06) puis relecture de la plage d'état (FC03)."""
+        client = self.bus.client
+        if not await self.bus.execute(client.write_register, address, value, device_id, priority=PRIORITY_COMMAND):
+            return None
+        self.stats["fc23_fallbacks"] += 1
+        return await self.bus.execute(
+            client.read_registers, read_address, read_count, device_id, False, priority=PRIORITY_COMMAND
+        )
+
+    async def send_coil(self, address: int, state: bool, device_id: int) -> bool:
+        """
+        Écrire une bobine immédiatement, sans fenêtre de regroupement ni suppression des redondances.
+
+        Utilisé pour les séquences minutées: chaque étape doit partir à son heure.
+        Le limiteur par automate et les interverrouillages s'appliquent.
+        """
+        return await self._send(address, state, device_id)
+
+    async def _send(self, address: int, state: bool, device_id: int) -> bool:
+        """Envoyer l'écriture en respectant l'interverrouillage de la bobine."""
+        group = self._interlocks.get((device_id, address)) if state else None
+        if group is None:
+            return await self._write(address, state, device_id)
+
+        # Les activations d'un même groupe sont sérialisées: deux bobines ne peuvent pas être activées ensemble
+        async with group.lock:
+            # Les autres bobines sont toujours coupées: la dernière valeur envoyée ne suffit pas,
+            # une bobine a pu être activée hors de l'intégration (proxy, bouton local, programme)
+            for key in group.coils:
+                if key == (device_id, address):
+                    continue
+                self.stats["interlock_releases"] += 1
+                _LOGGER.debug(f"Interlock: releasing coil {key[1]:04X} on slave {key[0]} before {address:04X}")
+                if not await self._write(key[1], False, key[0]):
+                    _LOGGER.error(f"Interlock: cannot release coil {key[1]:04X} on slave {key[0]}, {address:04X} not energized")
+                    return False
+            await asyncio.sleep(group.delay)
+            return await self._write(address, state, device_id)
+
+    async def _write(self, address: int, state: bool, device_id: int) -> bool:
+        """Envoyer l'écriture sur le bus (priorité commande)."""
+        if not await self._acquire(device_id):
+            self.stats["rate_limited"] += 1
+            _LOGGER.warning(f"Write {address:04X} = {state} on slave {device_id} dropped: rate limit exceeded")
+            return False
+
+        key = (device_id, address)
+        self._last_sent[key] = (state, time.monotonic())
+        self._in_flight[device_id] = self._in_flight.get(device_id, 0) + 1
+        try:
+            result = await self.bus.execute(
+                self.bus.client.write_coil, address, state, device_id, priority=PRIORITY_COMMAND
+            )
+        finally:
+            self._in_flight[device_id] -= 1
+            self._last_write[device_id] = time.monotonic()
+        if result:
+            self.stats["sent"] += 1
+        else:
+            self.stats["failed"] += 1
+            # Valeur inconnue: la prochaine écriture ne doit pas être considérée comme redondante
+            self._last_sent.pop(key, None)
+        return bool(result)
@@ -12,6 +12,37 @@ CONF_NAME = "name"
 CONF_RELAYS = "relays"
 CONF_SHUTTERS = "shutters"
 CONF_LIGHTS = "lights"
+CONF_SENSORS = "sensors"
+CONF_PROXY = "proxy"
+CONF_POLL_INTERVAL = "poll_interval"           # Intervalle (s) de la lecture cyclique
+CONF_SLAVE_POLL_INTERVALS = "slave_poll_intervals"   # Intervalle (s) propre à certains automates {device_id: s}
+CONF_BUS_BUDGET = "bus_budget"
+
+# Bus time budget configuration keys
+CONF_BUDGET_TARGET = "target_utilization"      # Part maximale du temps de bus (0-1)
+CONF_BUDGET_WRITE_RESERVE = "write_reserve"    # Part du temps de bus réservée aux écritures (0-1)
+CONF_BUDGET_TURNAROUND = "turnaround_ms"       # Temps de réponse estimé d'un automate (ms)
+CONF_BUDGET_MODE = "mode"                      # warn, refuse ou auto
+CONF_WRITE_WINDOW = "write_coalesce_window"    # Fenêtre (s) de regroupement des écritures sur une même bobine
+CONF_WRITE_RATE_LIMIT = "write_rate_limit"     # Écritures/s autorisées par automate
+CONF_WRITE_BURST = "write_burst"
+CONF_STATE_MAX_AGE = "state_max_age"           # Âge max (s) de l'état lu pour juger une écriture redondante
+CONF_BROADCAST_SETTLE = "broadcast_settle"     # Délai (s) entre un broadcast et la lecture de vérification
+CONF_HISTORY_SIZE = "history_size"             # Nombre de transitions conservées par registre d'état
+CONF_TOGGLE_VERIFY_DELAY = "toggle_verify_delay"   # Délai (s) avant la lecture de vérification d'une bobine télérupteur
+CONF_INTERLOCKS = "interlocks"                 # Groupes de bobines jamais actives en même temps (montée/descente)
+
+# Interlock configuration keys
+CONF_INTERLOCK_DEVICE_ID = "device_id"
+CONF_INTERLOCK_COILS = "coils"
+CONF_INTERLOCK_DELAY = "delay"                 # Temps mort (s) entre la coupure d'une bobine et l'activation d'une autre
+
+# Modbus TCP proxy configuration keys
+CONF_PROXY_HOST = "host"
+CONF_PROXY_PORT = "port"
+CONF_PROXY_MAX_CACHE_AGE = "max_cache_age"     # Âge max (s) d'une valeur en cache servie aux clients TCP
+CONF_PROXY_RATE_LIMIT = "rate_limit"           # Requêtes/s relayées sur le bus pour les clients TCP
+CONF_PROXY_BURST = "burst"
 
 # Light configuration keys
 CONF_LIGHT_NAME = "name"
@@ -36,6 +67,23 @@ CONF_SHUTTER_STATE_DOWN_POSITION = "state_down_pos"
 CONF_SHUTTER_ICON = "icon"
 CONF_SHUTTERT_DEVICE_CLASS = "device_class"  
 
+# Analog sensor configuration keys
+CONF_SENSOR_NAME = "name"
+CONF_SENSOR_DEVICE_ID = "device_id"
+CONF_SENSOR_ADDRESS = "address"
+CONF_SENSOR_REGISTER_TYPE = "register_type"     # "holding" ou "input"
+CONF_SENSOR_DATA_TYPE = "data_type"             # int16, uint16, int32, uint32, float32
+CONF_SENSOR_WORD_ORDER = "word_order"           # Ordre des mots pour les types 32 bits: "big" (poids fort en premier) ou "little"
+CONF_SENSOR_SCALE = "scale"
+CONF_SENSOR_OFFSET = "offset"
+CONF_SENSOR_PRECISION = "precision"
+CONF_SENSOR_UNIT = "unit_of_measurement"
+CONF_SENSOR_ICON = "icon"
+CONF_SENSOR_DEVICE_CLASS = "device_class"
+CONF_SENSOR_DEADBAND = "deadband"               # Bande morte absolue (dans l'unité après scale/offset)
+CONF_SENSOR_DEADBAND_PERCENT = "deadband_percent"   # Bande morte relative (% de la dernière valeur publiée)
+CONF_SENSOR_MIN_INTERVAL = "min_interval"       # Intervalle minimum entre deux publications (secondes)
+
 # Relay configuration keys
 CONF_RELAY_NAME = "name"
 CONF_RELAY_ADDRESS = "address"
@@ -43,6 +91,7 @@ CONF_RELAY_READ_ADDRESS = "read_address"  # Adresse pour lire l'état
 CONF_RELAY_ICON = "icon"
 CONF_RELAY_DEVICE_CLASS = "device_class"
 CONF_RELAY_DEVICE_ID = "device_id"
+CONF_RELAY_SKIP_REDUNDANT = "skip_redundant"    # Ignorer les écritures si l'état lu correspond déjà
 
 DEFAULT_ICON = "mdi:electric-switch"    # Icon interrupteur très simple
 
@@ -60,3 +109,53 @@ DEFAULT_STOPBITS = 1                # One stop bit
 DEFAULT_TIMEOUT = 5
 DEFAULT_DELAY = 0
 DEFAULT_MESSAGE_WAIT_MS = 30
+
+# Registres Modbus
+REGISTER_HOLDING = "holding"
+REGISTER_INPUT = "input"
+OUTPUT_STATE_REGISTER = 0x0613      # Holding register contenant les 16 états de sorties (Q1-Q8 + Y1-Y8)
+
+# Types de données des registres analogiques: nombre de registres 16 bits occupés
+DATA_TYPE_INT16 = "int16"
+DATA_TYPE_UINT16 = "uint16"
+DATA_TYPE_INT32 = "int32"
+DATA_TYPE_UINT32 = "uint32"
+DATA_TYPE_FLOAT32 = "float32"
+DATA_TYPE_REGISTER_COUNT = {
+    DATA_TYPE_INT16: 1,
+    DATA_TYPE_UINT16: 1,
+    DATA_TYPE_INT32: 2,
+    DATA_TYPE_UINT32: 2,
+    DATA_TYPE_FLOAT32: 2,
+}
+
+# Regroupement des lectures en plages (spans) par automate
+MAX_REGISTERS_PER_READ = 125        # Limite Modbus pour une lecture FC03/FC04
+DEFAULT_SPAN_MAX_GAP = 8            # Nombre max de registres inutiles lus pour fusionner deux plages
+DEFAULT_POLL_INTERVAL = 2           # Secondes entre deux cycles de lecture
+
+# Budget de temps du bus
+BUDGET_MODE_WARN = "warn"           # Avertir dans les logs
+BUDGET_MODE_REFUSE = "refuse"       # Refuser de démarrer l'intégration
+BUDGET_MODE_AUTO = "auto"           # Appliquer l'intervalle de lecture minimal sûr
+DEFAULT_BUDGET_TARGET = 0.7
+DEFAULT_BUDGET_WRITE_RESERVE = 0.15
+DEFAULT_BUDGET_TURNAROUND_MS = 10
+
+# Chemin des commandes
+DEFAULT_WRITE_WINDOW = 0.3
+DEFAULT_WRITE_RATE_LIMIT = 10.0
+DEFAULT_WRITE_BURST = 20
+DEFAULT_STATE_MAX_AGE = 5.0
+DEFAULT_TOGGLE_VERIFY_DELAY = 0.3
+DEFAULT_BROADCAST_SETTLE = 0.2
+DEFAULT_HISTORY_SIZE = 512
+DEFAULT_INTERLOCK_DELAY = 0.5
+FC23_UNANSWERED_LIMIT = 3           # FC23 sans réponse (repli FC06 + FC03 réussi) avant de le considérer non supporté
+
+# Proxy Modbus TCP
+DEFAULT_PROXY_HOST = "0.0.0.0"
+DEFAULT_PROXY_PORT = 5020
+DEFAULT_PROXY_MAX_CACHE_AGE = 3.0
+DEFAULT_PROXY_RATE_LIMIT = 5.0
+DEFAULT_PROXY_BURST = 10
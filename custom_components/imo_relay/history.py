@@ -0,0 +1,146 @@
+"""Historique en mémoire des commutations des sorties (usure des contacteurs, estimation d'énergie)."""
+from __future__ import annotations
+
+from array import array
+
+from homeassistant.util import dt as dt_util
+
+BITS_PER_WORD = 16
+
+
+def _start_of_day(timestamp: float) -> float:
+    """Horodatage de minuit (heure locale de Home Assistant) du jour de timestamp."""
+    local = dt_util.as_local(dt_util.utc_from_timestamp(timestamp))
+    return dt_util.start_of_local_day(local).timestamp()
+
+
+class WordHistory:
+    """
+    Historique d'un registre d'état 16 bits (une sortie par bit).
+
+    Les transitions sont stockées dans un tampon circulaire de taille fixe
+    (horodatage + mot lu + bits modifiés), dans des array compacts. Les compteurs
+    par sortie sont mis à jour à chaque transition: les requêtes sont en O(1).
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        # Tampon circulaire des transitions (la taille des éléments de array dépend de la plateforme)
+        self._timestamps = array("d", [0.0]) * size
+        self._words = array("H", [0]) * size
+        self._diffs = array("H", [0]) * size
+        self._next = 0
+        self._count = 0
+        # Compteurs incrémentaux par sortie
+        self._switch_count = array("L", [0]) * BITS_PER_WORD
+        self._on_total = array("d", [0.0]) * BITS_PER_WORD      # Temps ON cumulé (s) des périodes terminées
+        self._on_today = array("d", [0.0]) * BITS_PER_WORD      # Idem, depuis minuit
+        self._on_since = array("d", [0.0]) * BITS_PER_WORD      # Début de la période ON en cours
+        self._word: int | None = None
+        self._started: float | None = None
+        self._day_start = 0.0
+        self._next_day = 0.0
+
+    def _roll_day(self, now: float) -> None:
+        """Remettre à zéro les compteurs du jour après minuit."""
+        if now < self._next_day:
+            return
+        self._day_start = _start_of_day(now)
+        self._next_day = _start_of_day(self._day_start + 36 * 3600)
+        for bit in range(BITS_PER_WORD):
+            self._on_today[bit] = 0.0
+
+    def record(self, word: int, now: float) -> int:
+        """
+        Enregistrer un mot lu par la boucle de lecture.
+
+        Returns:
+            int: Masque des bits qui ont changé (0 si aucune transition)
+        """
+        self._roll_day(now)
+        if self._word is None:
+            # Première lecture: état initial, pas de transition
+            self._word = word
+            self._started = now
+            for bit in range(BITS_PER_WORD):
+                if word & (1 << bit):
+                    self._on_since[bit] = now
+            return 0
+
+        diff = word ^ self._word
+        if not diff:
+            return 0
+
+        index = self._next
+        self._timestamps[index] = now
+        self._words[index] = word
+        self._diffs[index] = diff
+        self._next = (index + 1) % self.size
+        self._count = min(self._count + 1, self.size)
+
+        for bit in range(BITS_PER_WORD):
+            mask = 1 << bit
+            if not diff & mask:
+                continue
+            self._switch_count[bit] += 1
+            if word & mask:
+                self._on_since[bit] = now
+            else:
+                since = self._on_since[bit]
+                self._on_total[bit] += now - since
+                self._on_today[bit] += now - max(since, self._day_start)
+        self._word = word
+        return diff
+
+    def stats(self, bit: int, now: float) -> dict:
+        """Compteurs d'une sortie (O(1), sans accès au bus ni à la base de données)."""
+        self._roll_day(now)
+        is_on = self._word is not None and bool(self._word & (1 << bit))
+        on_total = self._on_total[bit]
+        on_today = self._on_today[bit]
+        if is_on:
+            since = self._on_since[bit]
+            on_total += now - since
+            on_today += now - max(since, self._day_start)
+        tracked = now - self._started if self._started is not None else 0.0
+        elapsed_today = now - max(self._day_start, self._started or now)
+        return {
+            "is_on": is_on,
+            "switch_count": self._switch_count[bit],
+            "on_time_today": round(on_today, 1),
+            "on_time_total": round(on_total, 1),
+            "duty_cycle_today": round(on_today / elapsed_today, 4) if elapsed_today > 0 else 0.0,
+            "duty_cycle_total": round(on_total / tracked, 4) if tracked > 0 else 0.0,
+        }
+
+    def transitions(self, bit: int | None = None, limit: int = 20) -> list[tuple[float, int, int]]:
+        """Dernières transitions (horodatage, mot, bits modifiés), la plus récente en premier."""
+        result = []
+        for i in range(self._count):
+            index = (self._next - 1 - i) % self.size
+            diff = self._diffs[index]
+            if bit is not None and not diff & (1 << bit):
+                continue
+            result.append((self._timestamps[index], self._words[index], diff))
+            if len(result) >= limit:
+                break
+        return result
+
+
+class OutputHistory:
+    """Historiques de tous les registres d'état, par automate et par adresse."""
+
+    def __init__(self, size: int):
+        self.size = size
+        self._words: dict[tuple[int, int], WordHistory] = {}
+
+    def record(self, device_id: int, address: int, word: int, now: float) -> int:
+        """Enregistrer un mot lu; crée l'historique du registre à la première lecture."""
+        history = self._words.get((device_id, address))
+        if history is None:
+            history = self._words[(device_id, address)] = WordHistory(self.size)
+        return history.record(word, now)
+
+    def get(self, device_id: int, address: int) -> WordHistory | None:
+        """Historique d'un registre d'état, None s'il n'a jamais été lu."""
+        return self._words.get((device_id, address))
@@ -1,5 +1,6 @@
 """Switch platform for IMO Relay integration."""
 import logging
+import time
 from typing import Any
 
 from homeassistant.components.switch import SwitchEntity, SwitchDeviceClass
@@ -19,6 +20,8 @@ from .const import (
 
 )
 
+from .bus import PRIORITY_POLL, ModbusBus
+from .commands import CommandFilter
 from .modbus_client import ModbusRTUClient
 
 _LOGGER = logging.getLogger(__name__)
@@ -31,7 +34,10 @@ async def async_setup_platform(
     discovery_info: DiscoveryInfoType | None = None,
 ) -> None:
     """Set up light platform from configuration.yaml."""
+    start = time.monotonic()
     client: ModbusRTUClient = hass.data[DOMAIN]["client"]
+    bus: ModbusBus = hass.data[DOMAIN]["bus"]
+    commands: CommandFilter = hass.data[DOMAIN]["commands"]
     lights_config = hass.data[DOMAIN]["lights"]
     
     # Créer les entités de lights dynamiquement depuis la config
@@ -49,6 +55,8 @@ async def async_setup_platform(
         entities.append(
             IMOLightSwitch(
                 client = client,
+                bus = bus,
+                commands = commands,
                 light_id = light_id,
                 name = name,
                 device_id = device_id,
@@ -60,10 +68,13 @@ async def async_setup_platform(
             )
         )
     
-    async_add_entities(entities, True)
+    # Pas de mise à jour avant ajout: l'état arrive avec la première lecture groupée,
+    # après le démarrage de Home Assistant
+    async_add_entities(entities)
     
     # Enregistrer les entités pour la boucle d'update automatique
-    hass.data[DOMAIN]["entities"] = entities
+    hass.data[DOMAIN]["light_entities"] = entities
+    hass.data[DOMAIN]["profiler"].add("entities", time.monotonic() - start)
 
 
 
@@ -72,10 +83,13 @@ class IMOLightSwitch(SwitchEntity):
     
     _attr_has_entity_name = True
     _attr_assumed_state = False  # L'état est basé sur les dernières commandes envoyées
+    _attr_should_poll = False   # État poussé par la boucle de lecture groupée
     
     def __init__(
         self,
         client: ModbusRTUClient,
+        bus: ModbusBus,
+        commands: CommandFilter,
         light_id: str,
         device_id: int,
         coil_address: int,
@@ -87,6 +101,8 @@ class IMOLightSwitch(SwitchEntity):
     ):
         """Initialiser le switch."""
         self.client = client
+        self.bus = bus
+        self.commands = commands
         self.light_id = light_id
         self.coil_address = coil_address    # Adresse pour écrire
         self.read_address = read_address    # Adresse pour lire (si différente)
@@ -104,37 +120,34 @@ class IMOLightSwitch(SwitchEntity):
         """Retourner l'état du relais."""
         return self._state
     
+    async def _async_set_state(self, target: bool) -> None:
+        """Amener la lumière dans l'état voulu via la bobine télérupteur."""
+        # La bobine inverse la sortie à chaque écriture: le moteur de commandes
+        # vérifie l'état avant l'impulsion puis contrôle le résultat
+        state = await self.commands.toggle_coil(
+            self.coil_address, self.device_id, self.read_address, self.position, target
+        )
+        if state is None:
+            _LOGGER.error(f"Failed to turn {'ON' if target else 'OFF'} {self._attr_name}: state unknown")
+            return
+        if state != target:
+            _LOGGER.error(f"Failed to turn {'ON' if target else 'OFF'} {self._attr_name}")
+        else:
+            _LOGGER.info(f"{self._attr_name} is {'ON' if target else 'OFF'}")
+        self._state = state
+        self.async_write_ha_state()
+
     async def async_turn_on(self, **kwargs: Any) -> None:
         """Allumer la lumière"""
         try:
-            # Envoyer True pour allumer
-            result = await self.hass.async_add_executor_job(
-                self.client.write_coil, self.coil_address, True, self.device_id
-            )
-            if result:
-                _LOGGER.info(f"{self._attr_name} write coil ON command sent")
-                # Lire l'état réel après l'écriture (sans attendre, la boucle d'update va rafraîchir)
-
-
-            else:
-                _LOGGER.error(f"Failed to turn ON {self._attr_name}")
+            await self._async_set_state(True)
         except Exception as e:
             _LOGGER.error(f"Error turning ON {self._attr_name}: {e}")
     
     async def async_turn_off(self, **kwargs: Any) -> None:
-        """Éteindre le relais."""
+        """Éteindre la lumière"""
         try:
-            # Envoyer False pour éteindre
-            result = await self.hass.async_add_executor_job(
-                self.client.write_coil, self.coil_address, True, self.device_id
-            )
-            if result:
-                _LOGGER.info(f"{self._attr_name} write coil OFF command sent")
-                # Lire l'état réel après l'écriture (sans attendre, la boucle d'update va rafraîchir)
-
-
-            else:
-                _LOGGER.error(f"Failed to turn OFF {self._attr_name}")
+            await self._async_set_state(False)
         except Exception as e:
             _LOGGER.error(f"Error turning OFF {self._attr_name}: {e}")
     
@@ -143,7 +156,9 @@ class IMOLightSwitch(SwitchEntity):
         try:
             _LOGGER.debug(f"Manual update for {self._attr_name} at READ address {self.read_address:04X}")
             # Lire l'état réel depuis le Modbus à l'adresse de lecture (auto: coils puis discrete inputs)
-            state = await self.hass.async_add_executor_job(self.client.read_bit, self.read_address, self.device_id)
+            state = await self.bus.execute(
+                self.client.read_bit, self.read_address, self.position, self.device_id, priority=PRIORITY_POLL
+            )
             _LOGGER.debug(f"Read bit {self.read_address:04X} result: {state}")
             if state is not None:
                 # État réel sans inversion: True = ON, False = OFF
@@ -1,12 +1,55 @@
 """Modbus RTU client for IMO Ismart devices."""
+import inspect
 import logging
 from typing import Optional
-from pymodbus.client import ModbusSerialClient
-from pymodbus.exceptions import ModbusException
-from pymodbus.pdu import ExceptionResponse
 
 _LOGGER = logging.getLogger(__name__)
 
+# pymodbus n'est importé qu'à la préparation du client (dans l'executor, après le
+# démarrage de Home Assistant): le chargement de l'intégration reste léger.
+ModbusSerialClient = None
+ExceptionResponse = None
+
+
+class ModbusException(Exception):
+    """Remplacée par pymodbus.exceptions.ModbusException lors de l'import de pymodbus."""
+
+
+class ModbusIOException(ModbusException):
+    """Remplacée par pymodbus.exceptions.ModbusIOException lors de l'import de pymodbus."""
+
+
+def import_pymodbus() -> None:
+    """Importer pymodbus (une seule fois)."""
+    global ModbusSerialClient, ModbusException, ModbusIOException, ExceptionResponse
+    if ModbusSerialClient is not None:
+        return
+    from pymodbus.client import ModbusSerialClient as serial_client
+    from pymodbus.exceptions import ModbusException as modbus_exception
+    from pymodbus.exceptions import ModbusIOException as modbus_io_exception
+    from pymodbus.pdu import ExceptionResponse as exception_response
+
+    ModbusException = modbus_exception
+    ModbusIOException = modbus_io_exception
+    ExceptionResponse = exception_response
+    ModbusSerialClient = serial_client
+
+
+def slave_keyword(client) -> str:
+    """
+    Nom du paramètre qui désigne l'esclave dans l'API du client pymodbus.
+
+    pymodbus < 3.10 attend slave=, les versions suivantes device_id=. Un mot-clé
+    inconnu est ignoré silencieusement par pymodbus 3.6 (la trame part alors vers
+    l'esclave par défaut): il faut donc utiliser celui de la version installée.
+    """
+    try:
+        parameters = inspect.signature(client.read_holding_registers).parameters
+    except (AttributeError, TypeError, ValueError):
+        return "slave"
+    return "device_id" if "device_id" in parameters else "slave"
+
+
 class ModbusRTUClient:
     """Client Modbus RTU pour contrôler les relais IMO Ismart."""
     
@@ -35,20 +78,50 @@ class ModbusRTUClient:
         self.delay = delay
         self.message_wait_ms = message_wait_ms
         
-        self.client = ModbusSerialClient(
-            port=port,
-            baudrate=baudrate,
-            bytesize=bytesize,
-            parity=parity,
-            stopbits=stopbits,
-            timeout=timeout,
-        )
+        self.client = None     # Créé par prepare(), à la première connexion
+        self._slave_keyword = None     # slave= ou device_id= selon la version de pymodbus
         
         _LOGGER.debug(f"Initialized {name} client on {port}")
     
+    def prepare(self) -> None:
+        """Importer pymodbus et créer le client série (sans ouvrir le port)."""
+        if self.client is not None:
+            return
+        import_pymodbus()
+        try:
+            # pymodbus < 3.7: l'esclave 0 (broadcast) doit être activé explicitement; les
+            # trames unicast passent toutes par _slave() pour ne jamais partir vers l'esclave 0
+            self.client = ModbusSerialClient(
+                port=self.port,
+                baudrate=self.baudrate,
+                bytesize=self.bytesize,
+                parity=self.parity,
+                stopbits=self.stopbits,
+                timeout=self.timeout,
+                broadcast_enable=True,
+            )
+        except TypeError:
+            # Versions récentes: le broadcast est toujours supporté, le paramètre n'existe plus
+            self.client = ModbusSerialClient(
+                port=self.port,
+                baudrate=self.baudrate,
+                bytesize=self.bytesize,
+                parity=self.parity,
+                stopbits=self.stopbits,
+                timeout=self.timeout,
+            )
+        self._slave_keyword = slave_keyword(self.client)
+
+    def _slave(self, device_id: int) -> dict:
+        """Argument esclave des appels pymodbus, avec le mot-clé de la version installée."""
+        if self._slave_keyword is None:
+            self._slave_keyword = slave_keyword(self.client)
+        return {self._slave_keyword: device_id}
+
     def connect(self) -> bool:
         """Connecter au device Modbus."""
         try:
+            self.prepare()
             if self.client.connected:
                 _LOGGER.info(f"{self.name} already connected to {self.port}")
                 return True
@@ -66,6 +139,8 @@ class ModbusRTUClient:
     
     def close(self) -> None:
         """Fermer la connexion."""
+        if self.client is None:
+            return
         try:
             self.client.close()
             _LOGGER.info(f"{self.name} disconnected")
@@ -89,7 +164,7 @@ class ModbusRTUClient:
             result = self.client.write_coil(
                 address,
                 state,
-                device_id=device_id
+                **self._slave(device_id)
             )
             
             if isinstance(result, ExceptionResponse):
@@ -110,6 +185,45 @@ class ModbusRTUClient:
             _LOGGER.error(f"Unexpected error writing coil: {e}")
             return False
     
+    def broadcast_coil(self, address: int, state: bool) -> bool:
+        """
+        Écrire une bobine sur tous les automates à la fois (esclave 0, sans réponse).
+
+        Args:
+            address: Adresse de la bobine (identique sur tous les automates)
+            state: État de la bobine (True/False)
+
+        Returns:
+            bool: True si la trame a été émise (aucun accusé de réception en broadcast)
+        """
+        try:
+            if self.client is None or not self.client.connected:
+                _LOGGER.warning("Client not connected, attempting to reconnect...")
+                self.connect()
+
+            _LOGGER.debug(f"Broadcasting coil {address:04X} = {state}")
+
+            result = self.client.write_coil(address, state, **self._slave(0))
+
+            # En broadcast pymodbus ne retourne pas de réponse Modbus (aucun esclave ne répond)
+            if isinstance(result, ExceptionResponse):
+                _LOGGER.error(f"Modbus exception: {result}")
+                return False
+
+            if hasattr(result, "isError") and result.isError():
+                _LOGGER.error(f"Failed to broadcast coil: {result}")
+                return False
+
+            _LOGGER.info(f"Broadcast coil {address:04X} = {state}")
+            return True
+
+        except ModbusException as e:
+            _LOGGER.error(f"Modbus error: {e}")
+            return False
+        except Exception as e:
+            _LOGGER.error(f"Unexpected error broadcasting coil: {e}")
+            return False
+    
     def read_coil(self, address: int, device_id: int | None = None) -> Optional[bool]:
         """
         Lire une bobine (coil).
@@ -121,7 +235,7 @@ class ModbusRTUClient:
             bool ou None: État de la bobine ou None si erreur
         """
         try:
-            if not self.client.connected:
+            if self.client is None or not self.client.connected:
                 _LOGGER.warning(f"Client not connected, attempting to reconnect...")
                 self.connect()
             
@@ -130,7 +244,7 @@ class ModbusRTUClient:
             result = self.client.read_coils(
                 address=address,
                 count=1,
-                unit=device_id or self.slave_id
+                **self._slave(device_id or self.slave_id)
             )
             
             if isinstance(result, ExceptionResponse):
@@ -166,18 +280,18 @@ class ModbusRTUClient:
         Returns:
             bool ou None
         """
-        if position not in (0,16):
+        if position not in range(16):
             _LOGGER.error(f"Bit position is not in [0~15]")
             return None
         try:
-            if not self.client.connected:
+            if self.client is None or not self.client.connected:
                 _LOGGER.warning("Client not connected, attempting to reconnect...")
                 self.connect()
 
             # Lire le holding register complet
             _LOGGER.debug(f"Reading register {address:04X} to get bit {position}")
             
-            result = self.client.read_holding_registers(address = address, count = 1, slave = device_id)
+            result = self.client.read_holding_registers(address = address, count = 1, **self._slave(device_id))
             if isinstance(result, ExceptionResponse):
                 _LOGGER.error(f"Modbus exception reading register 0x{address:04X}: {result}")
                 return None
@@ -214,7 +328,7 @@ class ModbusRTUClient:
             list[bool] ou None: Liste de 16 bits extraits du registre
         """
         try:
-            if not self.client.connected:
+            if self.client is None or not self.client.connected:
                 _LOGGER.warning("Client not connected, attempting to reconnect...")
                 self.connect()
 
@@ -225,7 +339,7 @@ class ModbusRTUClient:
             result = self.client.read_holding_registers(
                 address=register_address,
                 count=1,
-                slave=device_id or self.slave_id,
+                **self._slave(device_id or self.slave_id),
             )
 
             if isinstance(result, ExceptionResponse):
@@ -258,6 +372,226 @@ class ModbusRTUClient:
             _LOGGER.error(f"Unexpected error reading coil {address:04X}: {e}", exc_info=True)
             return None
     
+    def read_registers(
+        self,
+        address: int,
+        count: int,
+        device_id: int | None = None,
+        input_registers: bool = False,
+    ) -> Optional[list]:
+        """
+        Lire une plage de registres en une seule trame (FC03 ou FC04).
+
+        Args:
+            address: Première adresse de la plage
+            count: Nombre de registres (max 125)
+            device_id: Esclave Modbus à interroger
+            input_registers: True pour lire des input registers (FC04) au lieu de holding registers (FC03)
+
+        Returns:
+            list[int] ou None: Valeurs brutes des registres
+        """
+        try:
+            if self.client is None or not self.client.connected:
+                _LOGGER.warning("Client not connected, attempting to reconnect...")
+                self.connect()
+
+            _LOGGER.debug(f"Reading {count} {'input' if input_registers else 'holding'} registers from {address:04X} on slave {device_id or self.slave_id}")
+
+            read = self.client.read_input_registers if input_registers else self.client.read_holding_registers
+            result = read(address=address, count=count, **self._slave(device_id or self.slave_id))
+
+            if isinstance(result, ExceptionResponse):
+                _LOGGER.error(f"Modbus exception reading registers {address:04X}+{count}: {result}")
+                return None
+
+            if result.isError():
+                _LOGGER.error(f"Failed to read registers {address:04X}+{count}: {result}")
+                return None
+
+            if not hasattr(result, 'registers') or len(result.registers) < count:
+                _LOGGER.error(f"Invalid response for registers {address:04X}+{count}: missing registers")
+                return None
+
+            return list(result.registers[:count])
+
+        except Exception as e:
+            _LOGGER.error(f"Unexpected error reading registers {address:04X}+{count}: {e}", exc_info=True)
+            return None
+
+    def read_bits(
+        self,
+        address: int,
+        count: int,
+        device_id: int | None = None,
+        discrete_inputs: bool = False,
+    ) -> Optional[list]:
+        """
+        Lire une plage de bobines (FC01) ou d'entrées discrètes (FC02).
+
+        Args:
+            address: Première adresse
+            count: Nombre de bits
+            device_id: Esclave Modbus à interroger
+            discrete_inputs: True pour lire des entrées discrètes au lieu de bobines
+
+        Returns:
+            list[bool] ou None
+        """
+        try:
+            if self.client is None or not self.client.connected:
+                _LOGGER.warning("Client not connected, attempting to reconnect...")
+                self.connect()
+
+            read = self.client.read_discrete_inputs if discrete_inputs else self.client.read_coils
+            result = read(address=address, count=count, **self._slave(device_id or self.slave_id))
+
+            if isinstance(result, ExceptionResponse):
+                _LOGGER.error(f"Modbus exception reading bits {address:04X}+{count}: {result}")
+                return None
+
+            if result.isError():
+                _LOGGER.error(f"Failed to read bits {address:04X}+{count}: {result}")
+                return None
+
+            if not hasattr(result, 'bits') or len(result.bits) < count:
+                _LOGGER.error(f"Invalid response for bits {address:04X}+{count}: missing bits")
+                return None
+
+            return [bool(bit) for bit in result.bits[:count]]
+
+        except Exception as e:
+            _LOGGER.error(f"Unexpected error reading bits {address:04X}+{count}: {e}", exc_info=True)
+            return None
+
+    def write_coils(self, address: int, states: list, device_id: int | None = None) -> bool:
+        """
+        Écrire plusieurs bobines consécutives (FC15).
+
+        Returns:
+            bool: True si succès, False sinon
+        """
+        try:
+            _LOGGER.debug(f"Writing {len(states)} coils from {address:04X}")
+
+            result = self.client.write_coils(address, states, **self._slave(device_id or self.slave_id))
+
+            if isinstance(result, ExceptionResponse):
+                _LOGGER.error(f"Modbus exception: {result}")
+                return False
+
+            if result.isError():
+                _LOGGER.error(f"Failed to write coils: {result}")
+                return False
+
+            return True
+
+        except ModbusException as e:
+            _LOGGER.error(f"Modbus error: {e}")
+            return False
+        except Exception as e:
+            _LOGGER.error(f"Unexpected error writing coils: {e}")
+            return False
+
+    def write_registers(self, address: int, values: list, device_id: int | None = None) -> bool:
+        """
+        Écrire plusieurs registres consécutifs (FC16).
+
+        Returns:
+            bool: True si succès, False sinon
+        """
+        try:
+            _LOGGER.debug(f"Writing {len(values)} registers from {address:04X}")
+
+            result = self.client.write_registers(address, values, **self._slave(device_id or self.slave_id))
+
+            if isinstance(result, ExceptionResponse):
+                _LOGGER.error(f"Modbus exception: {result}")
+                return False
+
+            if result.isError():
+                _LOGGER.error(f"Failed to write registers: {result}")
+                return False
+
+            return True
+
+        except ModbusException as e:
+            _LOGGER.error(f"Modbus error: {e}")
+            return False
+        except Exception as e:
+            _LOGGER.error(f"Unexpected error writing registers: {e}")
+            return False
+
+    def readwrite_registers(
+        self,
+        write_address: int,
+        values: list,
+        read_address: int,
+        read_count: int,
+        device_id: int | None = None,
+    ) -> tuple[bool, Optional[list]]:
+        """
+        Écrire des registres puis lire une plage dans la même transaction (FC23).
+
+        L'automate exécute l'écriture avant la lecture: les registres retournés
+        reflètent l'état juste après la commande.
+
+        Args:
+            write_address: Premier registre à écrire
+            values: Valeurs à écrire
+            read_address: Premier registre à lire
+            read_count: Nombre de registres à lire
+            device_id: Esclave Modbus
+
+        Returns:
+            (supporté, registres): supporté vaut False si l'automate répond
+            "fonction illégale" (FC23 non implémenté), None s'il ne répond pas
+            (certains automates ignorent FC23); registres vaut None en cas d'erreur
+        """
+        try:
+            if self.client is None or not self.client.connected:
+                _LOGGER.warning("Client not connected, attempting to reconnect...")
+                self.connect()
+
+            _LOGGER.debug(f"Writing {len(values)} registers from {write_address:04X} and reading {read_count} from {read_address:04X} on slave {device_id or self.slave_id}")
+
+            result = self.client.readwrite_registers(
+                read_address=read_address,
+                read_count=read_count,
+                write_address=write_address,
+                values=values,
+                **self._slave(device_id or self.slave_id),
+            )
+
+            if isinstance(result, ModbusIOException):
+                # Selon la version, pymodbus retourne l'absence de réponse au lieu de la lever
+                _LOGGER.warning(f"No response to read/write registers {write_address:04X} on slave {device_id or self.slave_id}: {result}")
+                return None, None
+
+            if isinstance(result, ExceptionResponse):
+                if getattr(result, "exception_code", None) == 0x01:
+                    # Exception 01 (fonction illégale): l'automate n'implémente pas FC23
+                    return False, None
+                _LOGGER.error(f"Modbus exception on read/write registers {write_address:04X}: {result}")
+                return True, None
+
+            if result.isError():
+                _LOGGER.error(f"Failed to read/write registers {write_address:04X}: {result}")
+                return True, None
+
+            if not hasattr(result, 'registers') or len(result.registers) < read_count:
+                _LOGGER.error(f"Invalid response for read/write registers {read_address:04X}+{read_count}: missing registers")
+                return True, None
+
+            return True, list(result.registers[:read_count])
+
+        except ModbusIOException as e:
+            _LOGGER.warning(f"No response to read/write registers {write_address:04X} on slave {device_id or self.slave_id}: {e}")
+            return None, None
+        except Exception as e:
+            _LOGGER.error(f"Unexpected error on read/write registers {write_address:04X}: {e}", exc_info=True)
+            return True, None
+
     def write_register(self, address: int, value: int, device_id: int | None = None) -> bool:
         """
         Écrire un registre.
@@ -275,7 +609,7 @@ class ModbusRTUClient:
             result = self.client.write_register(
                 address,
                 value,
-                device_id=device_id or self.slave_id
+                **self._slave(device_id or self.slave_id)
             )
             
             if isinstance(result, ExceptionResponse):
@@ -312,7 +646,7 @@ class ModbusRTUClient:
             result = self.client.read_holding_registers(
                 address,
                 count=1,
-                device_id=device_id or self.slave_id
+                **self._slave(device_id or self.slave_id)
             )
             
             if isinstance(result, ExceptionResponse):
@@ -0,0 +1,85 @@
+"""Lecture cyclique des automates: plages du plan de lecture, une trame par plage."""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from typing import Callable
+
+from .bus import PRIORITY_POLL, ModbusBus
+from .const import REGISTER_INPUT
+from .read_plan import ReadSpan, RegisterCache
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class Poller:
+    """
+    Lit les plages de chaque automate selon son intervalle et met le cache à jour.
+
+    Après chaque cycle d'un automate, on_polled(device_id, cycle_start) est appelé:
+    seules les valeurs du cache lues après cycle_start sont nouvelles.
+    """
+
+    def __init__(
+        self,
+        bus: ModbusBus,
+        cache: RegisterCache,
+        read_plan: dict[int, list[ReadSpan]],
+        poll_intervals: dict[int, float],
+        on_polled: Callable[[int, float], None] | None = None,
+    ):
+        self.bus = bus
+        self.cache = cache
+        self.read_plan = read_plan
+        self.poll_intervals = poll_intervals
+        self.on_polled = on_polled
+        self.last_success: dict[int, float] = {}    # slave -> fin du dernier cycle complet (monotonic)
+        self.stats = {"cycles": 0, "failed_reads": 0}
+
+    async def poll_device(self, device_id: int) -> bool:
+        """
+        Lire toutes les plages d'un automate puis notifier on_polled.
+
+        Returns:
+            bool: True si toutes les plages ont été lues
+        """
+        cycle_start = time.monotonic()
+        complete = True
+        # Lire chaque plage en une seule trame et mémoriser les registres
+        for span in self.read_plan[device_id]:
+            registers = await self.bus.execute(
+                self.bus.client.read_registers,
+                span.address,
+                span.count,
+                device_id,
+                span.register_type == REGISTER_INPUT,
+                priority=PRIORITY_POLL,
+            )
+            if registers is None:
+                complete = False
+                self.stats["failed_reads"] += 1
+            else:
+                self.cache.update(device_id, span.register_type, span.address, registers, time.monotonic())
+
+        self.stats["cycles"] += 1
+        if complete:
+            self.last_success[device_id] = time.monotonic()
+        if self.on_polled is not None:
+            self.on_polled(device_id, cycle_start)
+        return complete
+
+    async def run(self) -> None:
+        """Boucle de lecture: chaque automate est lu selon son propre intervalle."""
+        if not self.read_plan:
+            return
+        next_poll = {device_id: time.monotonic() + interval for device_id, interval in self.poll_intervals.items()}
+        while True:
+            try:
+                device_id = min(next_poll, key=next_poll.get)
+                await asyncio.sleep(max(0.0, next_poll[device_id] - time.monotonic()))
+                next_poll[device_id] = max(next_poll[device_id] + self.poll_intervals[device_id], time.monotonic())
+                await self.poll_device(device_id)
+
+            except Exception as e:
+                _LOGGER.error(f"Error in update loop: {e}", exc_info=True)
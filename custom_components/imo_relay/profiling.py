@@ -0,0 +1,45 @@
+"""Mesure des étapes du démarrage de l'intégration."""
+from __future__ import annotations
+
+import logging
+import time
+from contextlib import contextmanager
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class StartupProfiler:
+    """
+    Durées des étapes du démarrage (import, ouverture du port, première lecture, entités).
+
+    Les durées d'une même étape s'additionnent (une par plateforme par exemple);
+    le rapport n'est écrit qu'une seule fois dans les logs.
+    """
+
+    def __init__(self):
+        self._origin = time.monotonic()
+        self.timings: dict[str, float] = {}
+        self.reported = False
+
+    def add(self, name: str, seconds: float) -> None:
+        """Ajouter une durée (s) à une étape."""
+        self.timings[name] = self.timings.get(name, 0.0) + seconds
+
+    @contextmanager
+    def span(self, name: str):
+        """Mesurer la durée d'un bloc de code."""
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.add(name, time.monotonic() - start)
+
+    def report(self) -> dict[str, float]:
+        """Écrire le rapport dans les logs (une seule fois) et le retourner, en millisecondes."""
+        result = {name: round(seconds * 1000, 1) for name, seconds in self.timings.items()}
+        result["total"] = round((time.monotonic() - self._origin) * 1000, 1)
+        if not self.reported:
+            self.reported = True
+            details = ", ".join(f"{name}={ms} ms" for name, ms in result.items())
+            _LOGGER.info(f"Startup timings: {details}")
+        return result
@@ -0,0 +1,241 @@
+"""Proxy Modbus TCP: partage du bus RS485 avec des clients tiers (outil de programmation, Node-RED...)."""
+from __future__ import annotations
+
+import asyncio
+import logging
+import struct
+import time
+
+from .bus import PRIORITY_PROXY, ModbusBus, TokenBucket
+from .commands import CommandFilter
+from .const import MAX_REGISTERS_PER_READ, REGISTER_HOLDING, REGISTER_INPUT
+from .read_plan import RegisterCache
+
+_LOGGER = logging.getLogger(__name__)
+
+# Codes d'exception Modbus
+EXC_ILLEGAL_FUNCTION = 0x01
+EXC_ILLEGAL_DATA_VALUE = 0x03
+EXC_SERVER_BUSY = 0x06
+EXC_GATEWAY_PATH_UNAVAILABLE = 0x0A
+EXC_GATEWAY_TARGET_FAILED = 0x0B
+
+MBAP_HEADER = struct.Struct(">HHHB")     # transaction id, protocol id, longueur, unit id
+
+
+def exception_pdu(function_code: int, code: int) -> bytes:
+    """Construire une réponse d'exception Modbus."""
+    return bytes((function_code | 0x80, code))
+
+
+def pack_bits(bits: list) -> bytes:
+    """Compacter une liste de bits (LSB en premier) en octets."""
+    data = bytearray((len(bits) + 7) // 8)
+    for i, bit in enumerate(bits):
+        if bit:
+            data[i // 8] |= 1 << (i % 8)
+    return bytes(data)
+
+
+def unpack_bits(data: bytes, count: int) -> list:
+    """Décompacter count bits (LSB en premier)."""
+    return [bool(data[i // 8] & (1 << (i % 8))) for i in range(count)]
+
+
+class ModbusTCPProxy:
+    """
+    Serveur Modbus TCP embarqué qui relaie les requêtes vers le bus RS485.
+
+    Les lectures de registres sont servies depuis le cache de la boucle de lecture
+    quand les valeurs sont assez récentes; les autres requêtes passent par
+    l'ordonnanceur du bus avec la priorité la plus basse et un débit limité.
+
+    Les écritures FC05 sur une bobine interverrouillée passent par le filtre des
+    commandes (coupure des autres bobines du groupe puis temps mort); une écriture
+    FC15 qui active une bobine interverrouillée est refusée.
+    """
+
+    def __init__(
+        self,
+        bus: ModbusBus,
+        cache: RegisterCache,
+        host: str,
+        port: int,
+        max_cache_age: float,
+        rate_limit: float,
+        burst: int,
+        max_wait: float = 1.0,
+        commands: CommandFilter | None = None,
+    ):
+        self.bus = bus
+        self.cache = cache
+        self.commands = commands
+        self.host = host
+        self.port = port
+        self.max_cache_age = max_cache_age
+        self.max_wait = max_wait
+        self._bucket = TokenBucket(rate_limit, burst)
+        self._server: asyncio.AbstractServer | None = None
+        self._writers: set[asyncio.StreamWriter] = set()
+        self.stats = {
+            "requests": 0,
+            "cache_hits": 0,
+            "forwarded": 0,
+            "rate_limited": 0,
+            "errors": 0,
+            "interlocked": 0,       # Écritures FC05 relayées par le filtre des commandes
+            "refused": 0,           # Écritures FC15 refusées (activation d'une bobine interverrouillée)
+        }
+
+    async def async_start(self) -> None:
+        """Ouvrir le port TCP."""
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        _LOGGER.info(f"Modbus TCP proxy listening on {self.host}:{self.port}")
+
+    async def async_stop(self) -> None:
+        """Fermer le port TCP."""
+        if self._server is not None:
+            self._server.close()
+            # Fermer les connexions ouvertes, sinon wait_closed() attend leur fin
+            for writer in list(self._writers):
+                writer.close()
+            await self._server.wait_closed()
+            self._server = None
+            _LOGGER.info("Modbus TCP proxy stopped")
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Traiter les trames MBAP d'un client jusqu'à sa déconnexion."""
+        peer = writer.get_extra_info("peername")
+        _LOGGER.debug(f"Modbus TCP client connected: {peer}")
+        self._writers.add(writer)
+        try:
+            while True:
+                header = await reader.readexactly(MBAP_HEADER.size)
+                transaction_id, protocol_id, length, unit_id = MBAP_HEADER.unpack(header)
+                if protocol_id != 0 or length < 2:
+                    _LOGGER.warning(f"Invalid MBAP header from {peer}, closing connection")
+                    break
+                pdu = await reader.readexactly(length - 1)
+                response = await self.handle_pdu(unit_id, pdu)
+                writer.write(MBAP_HEADER.pack(transaction_id, 0, len(response) + 1, unit_id) + response)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except Exception as e:
+            _LOGGER.error(f"Error in Modbus TCP connection {peer}: {e}", exc_info=True)
+        finally:
+            self._writers.discard(writer)
+            writer.close()
+            _LOGGER.debug(f"Modbus TCP client disconnected: {peer}")
+
+    async def _acquire(self) -> bool:
+        """Attendre un jeton du limiteur de débit (au plus max_wait secondes)."""
+        deadline = time.monotonic() + self.max_wait
+        while not self._bucket.try_acquire():
+            wait = self._bucket.delay()
+            if time.monotonic() + wait > deadline:
+                return False
+            await asyncio.sleep(wait)
+        return True
+
+    def _interlocked(self, unit_id: int, address: int) -> bool:
+        """La bobine appartient-elle à un groupe d'interverrouillage."""
+        return self.commands is not None and bool(self.commands.interlocked_with(unit_id, address))
+
+    async def handle_pdu(self, unit_id: int, pdu: bytes) -> bytes:
+        """
+        Traiter une requête Modbus (PDU) et retourner la réponse (PDU).
+
+        Fonctions supportées: 1, 2, 3, 4, 5, 6, 15, 16.
+        """
+        self.stats["requests"] += 1
+        function_code = pdu[0]
+        if unit_id == 0:
+            return exception_pdu(function_code, EXC_GATEWAY_PATH_UNAVAILABLE)
+        try:
+            if function_code in (0x03, 0x04):
+                return await self._read_registers(unit_id, function_code, pdu)
+            if function_code in (0x01, 0x02, 0x05, 0x06, 0x0F, 0x10):
+                return await self._forward(unit_id, function_code, pdu)
+        except (struct.error, IndexError):
+            return exception_pdu(function_code, EXC_ILLEGAL_DATA_VALUE)
+        return exception_pdu(function_code, EXC_ILLEGAL_FUNCTION)
+
+    async def _read_registers(self, unit_id: int, function_code: int, pdu: bytes) -> bytes:
+        """FC03/FC04: servir depuis le cache si possible, sinon lire sur le bus."""
+        address, count = struct.unpack(">HH", pdu[1:5])
+        if not 1 <= count <= MAX_REGISTERS_PER_READ:
+            return exception_pdu(function_code, EXC_ILLEGAL_DATA_VALUE)
+        register_type = REGISTER_HOLDING if function_code == 0x03 else REGISTER_INPUT
+
+        cached = self.cache.get(unit_id, register_type, address, count)
+        if cached is not None and time.monotonic() - cached[1] <= self.max_cache_age:
+            self.stats["cache_hits"] += 1
+            registers = cached[0]
+        else:
+            if not await self._acquire():
+                self.stats["rate_limited"] += 1
+                return exception_pdu(function_code, EXC_SERVER_BUSY)
+            self.stats["forwarded"] += 1
+            registers = await self.bus.execute(
+                self.bus.client.read_registers, address, count, unit_id, register_type == REGISTER_INPUT,
+                priority=PRIORITY_PROXY,
+            )
+            if registers is None:
+                self.stats["errors"] += 1
+                return exception_pdu(function_code, EXC_GATEWAY_TARGET_FAILED)
+            self.cache.update(unit_id, register_type, address, registers, time.monotonic())
+
+        return struct.pack(f">BB{count}H", function_code, 2 * count, *registers)
+
+    async def _forward(self, unit_id: int, function_code: int, pdu: bytes) -> bytes:
+        """Relayer une lecture de bits ou une écriture sur le bus."""
+        client = self.bus.client
+        address, value = struct.unpack(">HH", pdu[1:5])
+        interlocked = False
+        if function_code in (0x01, 0x02):
+            if not 1 <= value <= 2000:
+                return exception_pdu(function_code, EXC_ILLEGAL_DATA_VALUE)
+            call = (client.read_bits, address, value, unit_id, function_code == 0x02)
+        elif function_code == 0x05:
+            if value not in (0xFF00, 0x0000):
+                return exception_pdu(function_code, EXC_ILLEGAL_DATA_VALUE)
+            call = (client.write_coil, address, value == 0xFF00, unit_id)
+            interlocked = self._interlocked(unit_id, address)
+        elif function_code == 0x06:
+            call = (client.write_register, address, value, unit_id)
+        elif function_code == 0x0F:
+            states = unpack_bits(pdu[6:], value)
+            energized = [address + offset for offset, state in enumerate(states) if state]
+            if any(self._interlocked(unit_id, coil) for coil in energized):
+                # Plusieurs bobines d'une même trame: impossible de couper le groupe avant l'activation
+                self.stats["refused"] += 1
+                _LOGGER.warning(f"Proxy FC15 {address:04X}+{value} on slave {unit_id} refused: energizes an interlocked coil")
+                return exception_pdu(function_code, EXC_ILLEGAL_DATA_VALUE)
+            call = (client.write_coils, address, states, unit_id)
+        else:
+            values = list(struct.unpack(f">{value}H", pdu[6:6 + 2 * value]))
+            call = (client.write_registers, address, values, unit_id)
+
+        if not await self._acquire():
+            self.stats["rate_limited"] += 1
+            return exception_pdu(function_code, EXC_SERVER_BUSY)
+        self.stats["forwarded"] += 1
+        if interlocked:
+            # Bobine interverrouillée: même chemin que les commandes de Home Assistant
+            self.stats["interlocked"] += 1
+            result = await self.commands.send_coil(address, value == 0xFF00, unit_id)
+        else:
+            result = await self.bus.execute(*call, priority=PRIORITY_PROXY)
+        if result is None or result is False:
+            self.stats["errors"] += 1
+            return exception_pdu(function_code, EXC_GATEWAY_TARGET_FAILED)
+
+        if function_code in (0x01, 0x02):
+            data = pack_bits(result)
+            return bytes((function_code, len(data))) + data
+        # Une écriture externe rend le cache de cet automate obsolète
+        self.cache.invalidate(unit_id)
+        if function_code in (0x05, 0x06):
+            return pdu[:5]
+        return struct.pack(">BHH", function_code, address, value)
@@ -0,0 +1,147 @@
+"""Regroupement des lectures de registres en plages (spans) par automate."""
+from __future__ import annotations
+
+import logging
+
+from .const import (
+    DEFAULT_SPAN_MAX_GAP,
+    MAX_REGISTERS_PER_READ,
+    REGISTER_HOLDING,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def output_bit_index(read_address: int) -> int | None:
+    """
+    Position d'une sortie dans le registre d'état 0x0613.
+
+    Conversion: 0x0000-0x0007 (Q1-Q8) = bits 0-7, 0x0010-0x0017 (Y1-Y8) = bits 8-15.
+    Retourne None pour une adresse hors de ces plages.
+    """
+    if 0x0000 <= read_address <= 0x0007:
+        return read_address
+    if 0x0010 <= read_address <= 0x0017:
+        return 8 + (read_address - 0x0010)
+    return None
+
+
+class ReadSpan:
+    """Une plage contiguë de registres lue en une seule trame Modbus."""
+
+    __slots__ = ("device_id", "register_type", "address", "count")
+
+    def __init__(self, device_id: int, register_type: str, address: int, count: int):
+        self.device_id = device_id
+        self.register_type = register_type
+        self.address = address
+        self.count = count
+
+    @property
+    def end(self) -> int:
+        """Adresse suivant le dernier registre de la plage."""
+        return self.address + self.count
+
+    def __repr__(self) -> str:
+        return f"ReadSpan(slave={self.device_id}, {self.register_type}, 0x{self.address:04X}+{self.count})"
+
+
+def coalesce_spans(
+    device_id: int,
+    register_type: str,
+    blocks: list[tuple[int, int]],
+    max_gap: int = DEFAULT_SPAN_MAX_GAP,
+    max_count: int = MAX_REGISTERS_PER_READ,
+) -> list[ReadSpan]:
+    """
+    Fusionner des blocs (adresse, nombre) en un minimum de plages.
+
+    Deux blocs sont fusionnés si l'écart entre eux ne dépasse pas max_gap registres
+    et si la plage résultante reste dans la limite Modbus (max_count registres).
+
+    Args:
+        device_id: Esclave Modbus
+        register_type: REGISTER_HOLDING ou REGISTER_INPUT
+        blocks: Liste de (adresse, nombre de registres), dans n'importe quel ordre
+
+    Returns:
+        list[ReadSpan]: Plages triées par adresse
+    """
+    spans: list[ReadSpan] = []
+    for address, count in sorted(blocks):
+        end = address + count
+        if spans:
+            last = spans[-1]
+            if address - last.end <= max_gap and max(end, last.end) - last.address <= max_count:
+                last.count = max(end, last.end) - last.address
+                continue
+        spans.append(ReadSpan(device_id, register_type, address, count))
+    return spans
+
+
+def build_read_plan(
+    blocks_by_device: dict[int, dict[str, list[tuple[int, int]]]],
+    max_gap: int = DEFAULT_SPAN_MAX_GAP,
+) -> dict[int, list[ReadSpan]]:
+    """
+    Compiler le plan de lecture de chaque automate.
+
+    Args:
+        blocks_by_device: {device_id: {register_type: [(adresse, nombre), ...]}}
+
+    Returns:
+        dict: {device_id: [ReadSpan, ...]} (holding registers d'abord)
+    """
+    plan: dict[int, list[ReadSpan]] = {}
+    for device_id, blocks_by_type in sorted(blocks_by_device.items()):
+        spans: list[ReadSpan] = []
+        # Holding registers en premier: ils portent l'état des sorties
+        for register_type in sorted(blocks_by_type, key=lambda t: t != REGISTER_HOLDING):
+            spans.extend(coalesce_spans(device_id, register_type, blocks_by_type[register_type], max_gap))
+        plan[device_id] = spans
+        _LOGGER.debug(f"Read plan for slave {device_id}: {spans}")
+    return plan
+
+
+class RegisterCache:
+    """Dernières valeurs lues pour chaque registre, par automate."""
+
+    def __init__(self):
+        # {(device_id, register_type): {adresse: (valeur, horodatage monotonic)}}
+        self._values: dict[tuple[int, str], dict[int, tuple[int, float]]] = {}
+
+    def update(self, device_id: int, register_type: str, address: int, registers: list[int], timestamp: float) -> None:
+        """Enregistrer le résultat d'une lecture de plage."""
+        table = self._values.setdefault((device_id, register_type), {})
+        for offset, value in enumerate(registers):
+            table[address + offset] = (value, timestamp)
+
+    @property
+    def device_ids(self) -> set[int]:
+        """Automates dont au moins une valeur est en cache."""
+        return {device_id for device_id, _ in self._values}
+
+    def invalidate(self, device_id: int) -> None:
+        """Oublier toutes les valeurs d'un automate (après une écriture externe par exemple)."""
+        for key in [key for key in self._values if key[0] == device_id]:
+            del self._values[key]
+
+    def get(self, device_id: int, register_type: str, address: int, count: int = 1) -> tuple[list[int], float] | None:
+        """
+        Retourner les registres [address, address + count) et l'horodatage le plus ancien.
+
+        Returns:
+            (registres, horodatage) ou None si au moins un registre n'a jamais été lu
+        """
+        table = self._values.get((device_id, register_type))
+        if table is None:
+            return None
+        registers = []
+        oldest = None
+        for addr in range(address, address + count):
+            entry = table.get(addr)
+            if entry is None:
+                return None
+            registers.append(entry[0])
+            oldest = entry[1] if oldest is None else min(oldest, entry[1])
+        return registers, oldest
@@ -0,0 +1,201 @@
+"""Sensor platform for IMO Relay integration (entrées/sorties analogiques)."""
+import logging
+import math
+import struct
+import time
+
+from homeassistant.components.sensor import SensorEntity
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.entity_platform import AddEntitiesCallback
+from homeassistant.helpers.typing import ConfigType, DiscoveryInfoType
+
+from .const import (
+    DOMAIN,
+    CONF_SENSOR_NAME,
+    CONF_SENSOR_DEVICE_ID,
+    CONF_SENSOR_ADDRESS,
+    CONF_SENSOR_REGISTER_TYPE,
+    CONF_SENSOR_DATA_TYPE,
+    CONF_SENSOR_WORD_ORDER,
+    CONF_SENSOR_SCALE,
+    CONF_SENSOR_OFFSET,
+    CONF_SENSOR_PRECISION,
+    CONF_SENSOR_UNIT,
+    CONF_SENSOR_ICON,
+    CONF_SENSOR_DEVICE_CLASS,
+    CONF_SENSOR_DEADBAND,
+    CONF_SENSOR_DEADBAND_PERCENT,
+    CONF_SENSOR_MIN_INTERVAL,
+    DATA_TYPE_INT16,
+    DATA_TYPE_INT32,
+    DATA_TYPE_UINT32,
+    DATA_TYPE_FLOAT32,
+    DATA_TYPE_REGISTER_COUNT,
+    REGISTER_HOLDING,
+)
+
+_LOGGER = logging.getLogger(__name__)
+
+
+async def async_setup_platform(
+    hass: HomeAssistant,
+    config: ConfigType,
+    async_add_entities: AddEntitiesCallback,
+    discovery_info: DiscoveryInfoType | None = None,
+) -> None:
+    """Set up sensor platform from configuration.yaml."""
+    start = time.monotonic()
+    sensors_config = hass.data[DOMAIN]["sensors"]
+    default_device_id = hass.data[DOMAIN]["config"].get("slave_id")
+
+    # Créer les entités analogiques dynamiquement depuis la config
+    entities = []
+    for idx, sensor_conf in enumerate(sensors_config):
+        entities.append(
+            IMOAnalogSensor(
+                sensor_id=f"sensor_{idx + 1}",
+                name=sensor_conf[CONF_SENSOR_NAME],
+                device_id=sensor_conf.get(CONF_SENSOR_DEVICE_ID, default_device_id),
+                address=sensor_conf[CONF_SENSOR_ADDRESS],
+                register_type=sensor_conf[CONF_SENSOR_REGISTER_TYPE],
+                data_type=sensor_conf[CONF_SENSOR_DATA_TYPE],
+                word_order=sensor_conf[CONF_SENSOR_WORD_ORDER],
+                scale=sensor_conf[CONF_SENSOR_SCALE],
+                offset=sensor_conf[CONF_SENSOR_OFFSET],
+                precision=sensor_conf.get(CONF_SENSOR_PRECISION),
+                unit=sensor_conf.get(CONF_SENSOR_UNIT),
+                icon=sensor_conf.get(CONF_SENSOR_ICON),
+                device_class=sensor_conf.get(CONF_SENSOR_DEVICE_CLASS),
+                deadband=sensor_conf[CONF_SENSOR_DEADBAND],
+                deadband_percent=sensor_conf[CONF_SENSOR_DEADBAND_PERCENT],
+                min_interval=sensor_conf[CONF_SENSOR_MIN_INTERVAL],
+            )
+        )
+
+    # Pas de mise à jour initiale: les valeurs arrivent via la boucle de lecture groupée
+    async_add_entities(entities)
+
+    # Enregistrer les entités pour la boucle d'update automatique
+    hass.data[DOMAIN]["sensor_entities"] = entities
+    hass.data[DOMAIN]["profiler"].add("entities", time.monotonic() - start)
+
+
+def decode_registers(registers: list[int], data_type: str, word_order: str = "big") -> float:
+    """
+    Convertir des registres 16 bits bruts en valeur numérique.
+
+    Args:
+        registers: Registres bruts (1 ou 2 selon le type)
+        data_type: int16, uint16, int32, uint32 ou float32
+        word_order: "big" si le mot de poids fort est le premier registre, "little" sinon
+    """
+    if DATA_TYPE_REGISTER_COUNT[data_type] == 1:
+        value = registers[0] & 0xFFFF
+        if data_type == DATA_TYPE_INT16 and value & 0x8000:
+            value -= 0x10000
+        return value
+
+    high, low = (registers[0], registers[1]) if word_order == "big" else (registers[1], registers[0])
+    raw = struct.pack(">HH", high & 0xFFFF, low & 0xFFFF)
+    if data_type == DATA_TYPE_INT32:
+        return struct.unpack(">i", raw)[0]
+    if data_type == DATA_TYPE_UINT32:
+        return struct.unpack(">I", raw)[0]
+    if data_type == DATA_TYPE_FLOAT32:
+        return struct.unpack(">f", raw)[0]
+    raise ValueError(f"Unknown data type {data_type}")
+
+
+class IMOAnalogSensor(SensorEntity):
+    """Représente un registre analogique (entrée ou sortie) d'un automate IMO."""
+
+    _attr_has_entity_name = True
+    _attr_should_poll = False   # Valeur poussée par la boucle de lecture groupée
+
+    def __init__(
+        self,
+        sensor_id: str,
+        name: str,
+        device_id: int,
+        address: int,
+        register_type: str = REGISTER_HOLDING,
+        data_type: str = "uint16",
+        word_order: str = "big",
+        scale: float = 1.0,
+        offset: float = 0.0,
+        precision: int | None = None,
+        unit: str | None = None,
+        icon: str | None = None,
+        device_class: str | None = None,
+        deadband: float = 0.0,
+        deadband_percent: float = 0.0,
+        min_interval: float = 0.0,
+    ):
+        """Initialiser le capteur."""
+        self.sensor_id = sensor_id
+        self.device_id = device_id
+        self.address = address
+        self.register_type = register_type
+        self.data_type = data_type
+        self.word_order = word_order
+        self.count = DATA_TYPE_REGISTER_COUNT[data_type]
+        self.scale = scale
+        self.offset = offset
+        self.precision = precision
+        self.deadband = deadband
+        self.deadband_percent = deadband_percent
+        self.min_interval = min_interval
+        self._attr_name = name
+        self._attr_unique_id = f"imo_relay_{sensor_id}"
+        self._attr_native_unit_of_measurement = unit
+        self._attr_icon = icon
+        self._attr_device_class = device_class
+        self._attr_native_value = None
+        self._last_publish = None   # Horodatage monotonic de la dernière publication
+
+    def _is_significant(self, value: float) -> bool:
+        """Vérifier si la nouvelle valeur sort de la bande morte autour de la dernière valeur publiée."""
+        last = self._attr_native_value
+        if last is None:
+            return True
+        delta = abs(value - last)
+        threshold = max(self.deadband, abs(last) * self.deadband_percent / 100)
+        if threshold > 0:
+            return delta >= threshold
+        return delta > 0
+
+    def handle_registers(self, registers: list[int], now: float | None = None) -> bool:
+        """
+        Traiter les registres bruts lus par la boucle d'update.
+
+        La valeur n'est publiée que si elle sort de la bande morte et si
+        l'intervalle minimum depuis la dernière publication est écoulé.
+
+        Returns:
+            bool: True si un nouvel état a été écrit dans Home Assistant
+        """
+        now = time.monotonic() if now is None else now
+        value = decode_registers(registers, self.data_type, self.word_order) * self.scale + self.offset
+        if not math.isfinite(value):
+            # float32 NaN/infini: état inconnu (sinon la bande morte bloquerait toute publication)
+            if self._attr_native_value is None:
+                return False
+            self._attr_native_value = None
+            self._last_publish = now
+            self.async_write_ha_state()
+            _LOGGER.debug(f"Updated {self._attr_name}: non-finite value, state unknown")
+            return True
+        if self.precision is not None:
+            value = round(value, self.precision)
+
+        if not self._is_significant(value):
+            return False
+        if self._last_publish is not None and now - self._last_publish < self.min_interval:
+            # Valeur retenue: elle sera publiée au prochain cycle si elle reste significative
+            return False
+
+        self._attr_native_value = value
+        self._last_publish = now
+        self.async_write_ha_state()
+        _LOGGER.debug(f"Updated {self._attr_name}: {value}")
+        return True
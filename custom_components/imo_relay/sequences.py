@@ -0,0 +1,217 @@
+"""Impulsions et séquences minutées de bobines, exécutées par l'intégration sur la boucle d'événements."""
+from __future__ import annotations
+
+import asyncio
+import itertools
+import logging
+import time
+
+from homeassistant.core import HomeAssistant
+
+from .commands import CommandFilter
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class CoilStep:
+    """Une écriture de bobine à un instant donné, relatif au début de la séquence."""
+
+    __slots__ = ("offset", "address", "state", "device_id")
+
+    def __init__(self, offset: float, address: int, state: bool, device_id: int):
+        self.offset = offset
+        self.address = address
+        self.state = state
+        self.device_id = device_id
+
+
+def pulse_steps(
+    address: int,
+    device_id: int,
+    duration: float,
+    count: int = 1,
+    interval: float | None = None,
+) -> list[CoilStep]:
+    """
+    Étapes d'une impulsion ou d'un train d'impulsions.
+
+    Args:
+        address: Bobine à activer
+        device_id: Esclave Modbus
+        duration: Durée (s) de chaque impulsion
+        count: Nombre d'impulsions
+        interval: Durée (s) de repos entre deux impulsions (défaut: duration)
+    """
+    interval = duration if interval is None else interval
+    steps = []
+    for index in range(count):
+        start = index * (duration + interval)
+        steps.append(CoilStep(start, address, True, device_id))
+        steps.append(CoilStep(start + duration, address, False, device_id))
+    return steps
+
+
+class SequenceRunner:
+    """
+    Exécute des séquences d'écritures de bobines à heure fixe.
+
+    Les instants sont calculés depuis le début de la séquence (horloge monotonic):
+    un retard sur une étape ne décale pas les suivantes. Seule exception, une coupure
+    qui suit une activation de la même bobine est minutée depuis la fin réelle de
+    cette activation: la coupure des bobines interverrouillées et le temps mort,
+    faits juste avant l'activation, ne raccourcissent pas l'impulsion. Les écritures passent par
+    le filtre des commandes (priorité commande sur le bus, limiteur, interverrouillages)
+    sans fenêtre de regroupement. Une séquence annulée ou en échec coupe les bobines
+    qu'elle a laissées actives.
+    """
+
+    def __init__(self, hass: HomeAssistant, commands: CommandFilter):
+        self.hass = hass
+        self.commands = commands
+        self._ids = itertools.count(1)
+        self._running: dict[str, asyncio.Task] = {}
+        self._coils: dict[str, set[tuple[int, int]]] = {}    # séquence -> bobines (slave, adresse) utilisées
+        self.stats = {"started": 0, "completed": 0, "cancelled": 0, "failed": 0}
+
+    @property
+    def running(self) -> list[str]:
+        """Identifiants des séquences en cours."""
+        return list(self._running)
+
+    def check_interlocks(self, steps: list[CoilStep]) -> None:
+        """
+        Vérifier qu'une séquence n'active jamais deux bobines interverrouillées en même temps.
+
+        Raises:
+            ValueError: si une étape active une bobine alors qu'une bobine de son groupe est active
+        """
+        energized: set[tuple[int, int]] = set()
+        for step in sorted(steps, key=lambda step: step.offset):
+            key = (step.device_id, step.address)
+            if not step.state:
+                energized.discard(key)
+                continue
+            for partner in self.commands.interlocked_with(step.device_id, step.address):
+                if (step.device_id, partner) in energized:
+                    raise ValueError(
+                        f"Coils {partner:04X} and {step.address:04X} of slave {step.device_id} are interlocked "
+                        f"and would be energized together at {step.offset:.3f} s"
+                    )
+            energized.add(key)
+
+    async def start(self, steps: list[CoilStep], sequence_id: str | None = None) -> tuple[str, asyncio.Task]:
+        """
+        Démarrer une séquence.
+
+        Une séquence en cours qui porte le même identifiant ou qui utilise une des
+        mêmes bobines est d'abord annulée.
+
+        Returns:
+            (identifiant, tâche): le résultat de la tâche est le rapport d'exécution
+
+        Raises:
+            ValueError: si la séquence viole un interverrouillage
+        """
+        self.check_interlocks(steps)
+        sequence_id = sequence_id or f"sequence_{next(self._ids)}"
+        coils = {(step.device_id, step.address) for step in steps}
+
+        conflicting = [other for other, used in self._coils.items() if other == sequence_id or used & coils]
+        for other in conflicting:
+            _LOGGER.info(f"Sequence {other} replaced by {sequence_id}")
+            await self.cancel(other)
+
+        task = self.hass.async_create_task(self._run(sequence_id, sorted(steps, key=lambda step: step.offset)))
+        self._running[sequence_id] = task
+        self._coils[sequence_id] = coils
+        self.stats["started"] += 1
+
+        def _done(_task: asyncio.Task) -> None:
+            if self._running.get(sequence_id) is _task:
+                del self._running[sequence_id]
+                del self._coils[sequence_id]
+
+        task.add_done_callback(_done)
+        return sequence_id, task
+
+    async def cancel(self, sequence_id: str | None = None) -> list[str]:
+        """
+        Annuler une séquence (toutes si sequence_id est None) et attendre la coupure de ses bobines.
+
+        Returns:
+            list: Identifiants des séquences annulées
+        """
+        if sequence_id is None:
+            cancelled = list(self._running)
+        else:
+            cancelled = [sequence_id] if sequence_id in self._running else []
+        tasks = [self._running[other] for other in cancelled]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        return cancelled
+
+    async def stop(self) -> None:
+        """Annuler toutes les séquences (arrêt de Home Assistant)."""
+        await self.cancel()
+
+    async def _run(self, sequence_id: str, steps: list[CoilStep]) -> dict:
+        """Exécuter les étapes à leur heure puis couper les bobines restées actives."""
+        start = time.monotonic()
+        energized: set[tuple[int, int]] = set()
+        activated: dict[tuple[int, int], tuple[float, float]] = {}     # bobine -> (instant prévu, fin réelle de l'activation)
+        report = []
+        status = "completed"
+        try:
+            for step in steps:
+                key = (step.device_id, step.address)
+                due = start + step.offset
+                if not step.state and key in activated:
+                    # Durée d'activation comptée depuis l'écriture réelle (temps mort d'interverrouillage, bus occupé)
+                    planned, done = activated.pop(key)
+                    due = max(due, done + step.offset - planned)
+                delay = due - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                if step.state:
+                    # Considérée active dès l'envoi: une annulation pendant l'écriture la coupera
+                    energized.add(key)
+                called = time.monotonic()
+                ok = await self.commands.send_coil(step.address, step.state, step.device_id)
+                done = time.monotonic()
+                # Début réel de l'écriture, après la coupure des bobines interverrouillées
+                sent = self.commands.sent_at(step.device_id, step.address) if ok else None
+                sent = called if sent is None or sent < called else sent
+                if ok and step.state:
+                    activated[key] = (step.offset, done)
+                report.append({
+                    "address": step.address,
+                    "device_id": step.device_id,
+                    "state": step.state,
+                    "planned": round(step.offset, 3),
+                    "sent": round(sent - start, 3),
+                    "done": round(done - start, 3),
+                    "ok": ok,
+                })
+                if not ok:
+                    status = "failed"
+                    _LOGGER.error(f"Sequence {sequence_id}: write {step.address:04X} = {step.state} on slave {step.device_id} failed, aborting")
+                    break
+                if not step.state:
+                    energized.discard(key)
+        except asyncio.CancelledError:
+            status = "cancelled"
+            _LOGGER.info(f"Sequence {sequence_id} cancelled")
+
+        # Ne jamais laisser une bobine active après une séquence interrompue
+        # (une séquence terminée peut volontairement laisser des bobines actives)
+        released = []
+        if status != "completed":
+            for device_id, address in sorted(energized):
+                if await self.commands.send_coil(address, False, device_id):
+                    released.append({"address": address, "device_id": device_id})
+                else:
+                    _LOGGER.error(f"Sequence {sequence_id}: cannot release coil {address:04X} on slave {device_id}")
+
+        self.stats[status] += 1
+        return {"sequence_id": sequence_id, "status": status, "steps": report, "released": released}
@@ -1,5 +1,6 @@
 """Switch platform for IMO Relay integration."""
 import logging
+import time
 from typing import Any
 
 from homeassistant.components.switch import SwitchEntity, SwitchDeviceClass
@@ -15,8 +16,14 @@ from .const import (
     CONF_RELAY_ICON,
     CONF_RELAY_DEVICE_CLASS,
     CONF_RELAY_DEVICE_ID,
+    CONF_RELAY_SKIP_REDUNDANT,
+    CONF_SLAVE_ID,
+    OUTPUT_STATE_REGISTER,
 )
+from .bus import PRIORITY_POLL, ModbusBus
+from .commands import CommandFilter
 from .modbus_client import ModbusRTUClient
+from .read_plan import output_bit_index
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -28,8 +35,12 @@ async def async_setup_platform(
     discovery_info: DiscoveryInfoType | None = None,
 ) -> None:
     """Set up switch platform from configurationswitch.yaml."""
+    start = time.monotonic()
     client: ModbusRTUClient = hass.data[DOMAIN]["client"]
-    relays_config = hass.data[DOMAIN]["switch"]
+    bus: ModbusBus = hass.data[DOMAIN]["bus"]
+    commands: CommandFilter = hass.data[DOMAIN]["commands"]
+    relays_config = hass.data[DOMAIN]["relays"]
+    default_device_id = hass.data[DOMAIN]["config"][CONF_SLAVE_ID]
     #lights_config = hass.data[DOMAIN]["ligths"]
     
     # Créer les entités de relais dynamiquement depuis la config
@@ -41,11 +52,14 @@ async def async_setup_platform(
         read_address = relay_conf.get(CONF_RELAY_READ_ADDRESS)  # Optionnel
         icon = relay_conf.get(CONF_RELAY_ICON, "mdi:electric-switch")
         device_class = relay_conf.get(CONF_RELAY_DEVICE_CLASS)
-        device_id = relay_conf.get(CONF_RELAY_DEVICE_ID)
+        device_id = relay_conf.get(CONF_RELAY_DEVICE_ID, default_device_id)
+        skip_redundant = relay_conf.get(CONF_RELAY_SKIP_REDUNDANT, False)
         
         entities.append(
             IMORelaySwitch(
                 client=client,
+                bus=bus,
+                commands=commands,
                 relay_id=relay_id,
                 address=address,
                 read_address=read_address,
@@ -53,13 +67,17 @@ async def async_setup_platform(
                 icon=icon,
                 device_class=device_class,
                 device_id=device_id,
+                skip_redundant=skip_redundant,
             )
         )
     
-    async_add_entities(entities, True)
+    # Pas de mise à jour avant ajout: l'état arrive avec la première lecture groupée,
+    # après le démarrage de Home Assistant
+    async_add_entities(entities)
     
     # Enregistrer les entités pour la boucle d'update automatique
     hass.data[DOMAIN]["entities"] = entities
+    hass.data[DOMAIN]["profiler"].add("entities", time.monotonic() - start)
 
 
 
@@ -68,10 +86,13 @@ class IMORelaySwitch(SwitchEntity):
     
     _attr_has_entity_name = True
     _attr_assumed_state = False  # L'état est basé sur les dernières commandes envoyées
+    _attr_should_poll = False   # État poussé par la boucle de lecture groupée
     
     def __init__(
         self,
         client: ModbusRTUClient,
+        bus: ModbusBus,
+        commands: CommandFilter,
         relay_id: str,
         address: int,
         read_address: int | None,
@@ -79,13 +100,18 @@ class IMORelaySwitch(SwitchEntity):
         icon: str | None = None,
         device_class: str | None = None,
         device_id: int | None = None,
+        skip_redundant: bool = False,
     ):
         """Initialiser le switch."""
         self.client = client
+        self.bus = bus
+        self.commands = commands
         self.relay_id = relay_id
         self.address = address  # Adresse pour écrire
-        self.read_address = read_address or address  # Adresse pour lire (si différente)
+        self.read_address = read_address if read_address is not None else address  # Adresse pour lire (si différente)
         self.device_id = device_id
+        # Bit d'état dans 0x0613: permet d'ignorer les écritures redondantes (opt-in)
+        self.state_bit = output_bit_index(self.read_address) if skip_redundant else None
         self._attr_name = name
         self._attr_unique_id = f"imo_relay_{relay_id}"
         self._attr_icon = icon or "mdi:electric-switch"
@@ -102,8 +128,8 @@ class IMORelaySwitch(SwitchEntity):
         """Allumer le relais."""
         try:
             # Envoyer True pour allumer
-            result = await self.hass.async_add_executor_job(
-                self.client.write_coil, self.address, True, self.device_id
+            result = await self.commands.write_coil(
+                self.address, True, self.device_id, self.state_bit
             )
             if result:
                 _LOGGER.info(f"{self._attr_name} write coil ON command sent")
@@ -117,8 +143,8 @@ class IMORelaySwitch(SwitchEntity):
         """Éteindre le relais."""
         try:
             # Envoyer False pour éteindre
-            result = await self.hass.async_add_executor_job(
-                self.client.write_coil, self.address, False, self.device_id
+            result = await self.commands.write_coil(
+                self.address, False, self.device_id, self.state_bit
             )
             if result:
                 _LOGGER.info(f"{self._attr_name} write coil OFF command sent")
@@ -132,9 +158,13 @@ class IMORelaySwitch(SwitchEntity):
         """Mettre à jour l'état du relais en lisant le coil Modbus."""
         try:
             _LOGGER.debug(f"Manual update for {self._attr_name} at READ address {self.read_address:04X}")
-            # Lire l'état réel depuis le Modbus à l'adresse de lecture (auto: coils puis discrete inputs)
-            state = await self.hass.async_add_executor_job(
-                self.client.read_bit, self.read_address, self.device_id
+            # Lire l'état réel: bit de la sortie dans le registre d'état 0x0613
+            bit_index = output_bit_index(self.read_address)
+            if bit_index is None:
+                _LOGGER.warning(f"Unknown read_address {self.read_address:04X} for {self._attr_name}")
+                return
+            state = await self.bus.execute(
+                self.client.read_bit, OUTPUT_STATE_REGISTER, bit_index, self.device_id, priority=PRIORITY_POLL
             )
             _LOGGER.debug(f"Read bit {self.read_address:04X} result: {state}")
             if state is not None:
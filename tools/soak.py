@@ -0,0 +1,724 @@
+#!/usr/bin/env python3
+"""
+Banc d'endurance avec injection de fautes pour le bus RS485 de l'intégration IMO Relay.
+
+Le client Modbus de l'intégration (ModbusRTUClient) est branché sur des automates
+simulés au lieu du port série. La liaison simulée injecte les défauts observés sur
+les longues lignes RS485:
+
+- trames corrompues (CRC): réponse en erreur (isError)
+- trames perdues: aucune réponse avant le timeout (ModbusIOException)
+- automate occupé: réponse d'exception Modbus (ExceptionResponse, code 06)
+- réponses retardées
+- déconnexions du port (adaptateur USB débranché), avec reconnexion par le client
+
+La pile complète tourne pendant toute la durée: ordonnanceur du bus, lecture
+cyclique (Poller), cache, filtre des commandes (écritures et télérupteurs),
+historique des sorties et proxy Modbus TCP, interrogé par un client TCP local
+(lectures servies par le cache ou relayées, écritures de registres). Les automates
+changent aussi d'état localement (bouton poussoir, programme), comme une
+installation réelle.
+
+Rapport final:
+- temps de rétablissement après une déconnexion et durée des coupures de lecture
+- commandes perdues: acceptées (True) alors que la sortie n'est pas dans l'état demandé
+- requêtes du proxy: réponses correctes, exceptions Modbus par code, écritures perdues
+- durée pendant laquelle l'état publié diffère de l'état réel des sorties
+- croissance de la mémoire (tracemalloc) après la phase de chauffe
+
+Nécessite l'environnement de développement de l'intégration (homeassistant et pymodbus):
+
+    python tools/soak.py --duration 3600 --slaves 3 --corrupt 0.02 --drop 0.02 --disconnect-every 600
+
+Le code de sortie est 1 si des commandes ou des écritures du proxy ont été perdues, si la
+boucle de lecture a levé une exception, si le proxy a retourné une trame invalide ou si
+la mémoire a trop augmenté.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import random
+import struct
+import sys
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from pymodbus.exceptions import ConnectionException, ModbusIOException
+from pymodbus.pdu import ExceptionResponse
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from custom_components.imo_relay import modbus_client  # noqa: E402
+from custom_components.imo_relay.budget import char_time  # noqa: E402
+from custom_components.imo_relay.bus import ModbusBus  # noqa: E402
+from custom_components.imo_relay.commands import CommandFilter  # noqa: E402
+from custom_components.imo_relay.const import OUTPUT_STATE_REGISTER, REGISTER_HOLDING  # noqa: E402
+from custom_components.imo_relay.history import OutputHistory  # noqa: E402
+from custom_components.imo_relay.modbus_client import ModbusRTUClient  # noqa: E402
+from custom_components.imo_relay.poller import Poller  # noqa: E402
+from custom_components.imo_relay.proxy import MBAP_HEADER, ModbusTCPProxy  # noqa: E402
+from custom_components.imo_relay.read_plan import RegisterCache, build_read_plan  # noqa: E402
+
+_LOGGER = logging.getLogger("imo_relay.soak")
+
+# Cartographie des automates simulés
+RELAY_COIL_BASE = 0x0551        # Bobine 0x0551 + i = sortie i (bit i de 0x0613)
+TOGGLE_COIL_BASE = 0x0571       # Bobine télérupteur 0x0571 + i = inverse le bit i de 0x0614
+LIGHT_STATE_REGISTER = 0x0614
+ANALOG_REGISTER = 0x0100        # Quatre registres analogiques qui dérivent lentement
+ANALOG_COUNT = 4
+OUTPUTS = 16
+SCRATCH_REGISTER = 0x0300       # Registres hors plan de lecture, écrits par le client du proxy
+SCRATCH_COUNT = 2
+
+
+class _Response:
+    """Réponse Modbus valide (registres ou bits)."""
+
+    def __init__(self, registers: list[int] | None = None, bits: list[bool] | None = None):
+        self.registers = registers or []
+        self.bits = bits or []
+
+    def isError(self) -> bool:  # noqa: N802 - API pymodbus
+        return False
+
+
+class _ErrorResponse(_Response):
+    """Trame reçue mais inexploitable (CRC faux): pymodbus retourne une réponse en erreur."""
+
+    def isError(self) -> bool:  # noqa: N802 - API pymodbus
+        return True
+
+    def __str__(self) -> str:
+        return "Simulated CRC error"
+
+
+class SimulatedSlave:
+    """État d'un automate IMO simulé: registres d'état des sorties et registres analogiques."""
+
+    def __init__(self, device_id: int, rng: random.Random):
+        self.device_id = device_id
+        self.rng = rng
+        self.holding = {OUTPUT_STATE_REGISTER: 0, LIGHT_STATE_REGISTER: 0}
+        for offset in range(ANALOG_COUNT):
+            self.holding[ANALOG_REGISTER + offset] = rng.randrange(0, 1000)
+
+    def read(self, address: int, count: int) -> list[int]:
+        """Lire des registres; les valeurs analogiques dérivent à chaque lecture."""
+        for offset in range(ANALOG_COUNT):
+            value = self.holding[ANALOG_REGISTER + offset] + self.rng.randint(-3, 3)
+            self.holding[ANALOG_REGISTER + offset] = min(max(value, 0), 0xFFFF)
+        return [self.holding.get(address + offset, 0) for offset in range(count)]
+
+    def read_coils(self, address: int, count: int) -> list[bool]:
+        """Lire des bobines: les bobines de sortie reflètent le registre d'état des sorties."""
+        word = self.holding[OUTPUT_STATE_REGISTER]
+        return [
+            RELAY_COIL_BASE <= address + offset < RELAY_COIL_BASE + OUTPUTS
+            and bool(word & (1 << (address + offset - RELAY_COIL_BASE)))
+            for offset in range(count)
+        ]
+
+    def write_registers(self, address: int, values: list[int]) -> None:
+        """Écrire des registres (les registres d'état ne sont pas inscriptibles)."""
+        for offset, value in enumerate(values):
+            if address + offset not in (OUTPUT_STATE_REGISTER, LIGHT_STATE_REGISTER):
+                self.holding[address + offset] = value
+
+    def write_coil(self, address: int, state: bool) -> None:
+        """Appliquer une écriture de bobine (sortie directe ou impulsion télérupteur)."""
+        if RELAY_COIL_BASE <= address < RELAY_COIL_BASE + OUTPUTS:
+            mask = 1 << (address - RELAY_COIL_BASE)
+            word = self.holding[OUTPUT_STATE_REGISTER]
+            self.holding[OUTPUT_STATE_REGISTER] = word | mask if state else word & ~mask
+        elif TOGGLE_COIL_BASE <= address < TOGGLE_COIL_BASE + OUTPUTS and state:
+            self.holding[LIGHT_STATE_REGISTER] ^= 1 << (address - TOGGLE_COIL_BASE)
+
+    def local_change(self) -> None:
+        """Changement d'état local (bouton poussoir, programme de l'automate)."""
+        register = self.rng.choice([OUTPUT_STATE_REGISTER, LIGHT_STATE_REGISTER])
+        self.holding[register] ^= 1 << self.rng.randrange(OUTPUTS)
+
+
+class FaultyLink:
+    """
+    Liaison RS485 simulée, compatible avec les appels du client pymodbus utilisés
+    par ModbusRTUClient. Les méthodes sont bloquantes (executor), comme le vrai port.
+
+    L'esclave est passé par device_id= (API pymodbus >= 3.10), sans **kwargs: un
+    appel avec un autre mot-clé échoue au lieu de partir vers un autre automate.
+    """
+
+    def __init__(self, slaves: dict[int, SimulatedSlave], args: argparse.Namespace, rng: random.Random):
+        self.slaves = slaves
+        self.args = args
+        self.rng = rng
+        self.lock = threading.Lock()
+        self.t_char = char_time(args.baudrate)
+        self.connected = False
+        self._down_until = 0.0
+        self._next_disconnect = self._schedule_disconnect(time.monotonic())
+        self.outage_id = 0          # Incrémenté à chaque fin de déconnexion
+        self.last_up = 0.0          # Fin de la dernière déconnexion (monotonic)
+        self.faults = {"corrupt": 0, "drop": 0, "busy": 0, "delay": 0, "disconnect": 0, "not_connected": 0}
+
+    def _schedule_disconnect(self, now: float) -> float:
+        if self.args.disconnect_every <= 0:
+            return float("inf")
+        return now + self.rng.expovariate(1 / self.args.disconnect_every)
+
+    def _port_available(self) -> bool:
+        """Simuler le débranchement de l'adaptateur à intervalles aléatoires."""
+        now = time.monotonic()
+        if now >= self._next_disconnect:
+            self.faults["disconnect"] += 1
+            self.connected = False
+            self._down_until = now + self.args.disconnect_for
+            self._next_disconnect = self._schedule_disconnect(self._down_until)
+            _LOGGER.info(f"Port disconnected for {self.args.disconnect_for} s")
+        return now >= self._down_until
+
+    def connect(self) -> bool:
+        with self.lock:
+            if not self._port_available():
+                return False
+            if not self.connected:
+                self.connected = True
+                if self.last_up < self._down_until:
+                    # Le port est de nouveau disponible depuis la fin de la déconnexion
+                    self.last_up = self._down_until
+                    self.outage_id += 1
+            return True
+
+    def close(self) -> None:
+        self.connected = False
+
+    def _transaction(self, device_id: int, request_chars: int, response_chars: int, apply):
+        """
+        Une transaction maître/esclave avec injection de fautes.
+
+        apply() est exécuté côté automate si la requête lui parvient; pour une
+        écriture, la réponse peut être perdue alors que la commande a été appliquée.
+        """
+        # Comme pymodbus: tentative de reconnexion avant chaque transaction
+        if not self.connected and not self.connect():
+            self.faults["not_connected"] += 1
+            raise ConnectionException("Simulated port not available")
+        if not self._port_available():
+            self.connected = False
+            self.faults["not_connected"] += 1
+            raise ConnectionException("Simulated port disconnected")
+
+        slave = self.slaves.get(device_id)
+        wire = (request_chars + response_chars + 7) * self.t_char + self.args.turnaround_ms / 1000
+        roll = self.rng.random()
+        args = self.args
+
+        if slave is None or roll < args.drop:
+            # Aucune réponse: la requête (ou la réponse) s'est perdue
+            self.faults["drop"] += 1
+            if slave is not None and self.rng.random() < 0.5:
+                with self.lock:
+                    apply(slave)
+            time.sleep(args.timeout)
+            raise ModbusIOException("No response received (simulated drop)")
+        roll -= args.drop
+
+        if roll < args.corrupt:
+            self.faults["corrupt"] += 1
+            if self.rng.random() < 0.5:
+                with self.lock:
+                    apply(slave)
+            time.sleep(wire)
+            return _ErrorResponse()
+        roll -= args.corrupt
+
+        if roll < args.busy:
+            self.faults["busy"] += 1
+            time.sleep(wire)
+            return ExceptionResponse(0x03, 0x06)
+        roll -= args.busy
+
+        if roll < args.delay:
+            self.faults["delay"] += 1
+            delay = args.delay_ms / 1000
+            if delay >= args.timeout:
+                with self.lock:
+                    apply(slave)
+                time.sleep(args.timeout)
+                raise ModbusIOException("Response too late (simulated delay)")
+            wire += delay
+
+        with self.lock:
+            result = apply(slave)
+        time.sleep(wire)
+        return result
+
+    # API pymodbus utilisée par ModbusRTUClient
+
+    def read_holding_registers(self, address: int, count: int = 1, device_id: int = 1):
+        return self._transaction(
+            device_id, 8, 5 + 2 * count, lambda s: _Response(registers=s.read(address, count))
+        )
+
+    def read_input_registers(self, address: int, count: int = 1, device_id: int = 1):
+        return self.read_holding_registers(address, count, device_id)
+
+    def read_coils(self, address: int, count: int = 1, device_id: int = 1):
+        return self._transaction(
+            device_id, 8, 5 + (count + 7) // 8, lambda s: _Response(bits=s.read_coils(address, count))
+        )
+
+    def write_coil(self, address: int, value: bool, device_id: int = 1):
+        if device_id == 0:
+            # Broadcast: aucun automate ne répond
+            with self.lock:
+                for slave in self.slaves.values():
+                    slave.write_coil(address, value)
+            time.sleep(8 * self.t_char + self.args.turnaround_ms / 1000)
+            return None
+
+        def apply(slave: SimulatedSlave):
+            slave.write_coil(address, value)
+            return _Response(bits=[value])
+
+        return self._transaction(device_id, 8, 8, apply)
+
+    def write_register(self, address: int, value: int, device_id: int = 1):
+        def apply(slave: SimulatedSlave):
+            slave.write_registers(address, [value])
+            return _Response(registers=[value])
+
+        return self._transaction(device_id, 8, 8, apply)
+
+    def write_registers(self, address: int, values: list[int], device_id: int = 1):
+        def apply(slave: SimulatedSlave):
+            slave.write_registers(address, values)
+            return _Response(registers=list(values))
+
+        return self._transaction(device_id, 9 + 2 * len(values), 8, apply)
+
+
+class SoakHass:
+    """Sous-ensemble de HomeAssistant utilisé par l'ordonnanceur du bus et le filtre des commandes."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="soak")
+
+    def async_create_task(self, coro):
+        return self.loop.create_task(coro)
+
+    async def async_add_executor_job(self, func, *args):
+        return await self.loop.run_in_executor(self.executor, func, *args)
+
+
+class _Stat:
+    """Statistique en mémoire constante: nombre, somme et maximum."""
+
+    __slots__ = ("count", "total", "maximum")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.maximum = 0.0
+
+    def add(self, value: float) -> None:
+        self.count += 1
+        self.total += value
+        self.maximum = max(self.maximum, value)
+
+    def as_dict(self, scale: float = 1.0) -> dict:
+        return {
+            "count": self.count,
+            "mean": round(self.total / self.count * scale, 3) if self.count else None,
+            "max": round(self.maximum * scale, 3),
+        }
+
+
+class _ErrorCounter(logging.Handler):
+    """Compte les erreurs inattendues de la boucle de lecture (exceptions avalées par Poller.run)."""
+
+    def __init__(self):
+        super().__init__(logging.ERROR)
+        self.count = 0
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.count += 1
+
+
+class SoakRun:
+    """Assemble la pile de l'intégration sur les automates simulés et mesure son comportement."""
+
+    def __init__(self, args: argparse.Namespace):
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.slaves = {device_id: SimulatedSlave(device_id, self.rng) for device_id in range(1, args.slaves + 1)}
+        self.link = FaultyLink(self.slaves, args, self.rng)
+
+        # Sorties publiées dans Home Assistant: {(slave, registre): mot}
+        self.published: dict[tuple[int, int], int] = {}
+        self.stale_since: dict[tuple[int, int], float] = {}
+        self.stale = _Stat()
+        self.stale_time = 0.0
+        self.read_outages = _Stat()
+        self.failing_since: dict[int, float] = {}
+        self.recovery = _Stat()
+        self.recovered: dict[int, int] = {}
+        self.commands = {"confirmed": 0, "failed": 0, "lost": 0}
+        self.toggles = {"confirmed": 0, "failed": 0, "lost": 0}
+        self.proxy_requests = {"ok": 0, "failed": 0, "lost": 0, "invalid": 0}
+        self.proxy_exceptions: dict[str, int] = {}
+        self.proxy_latency = _Stat()
+        self.max_queue = 0
+        self.loop_errors = _ErrorCounter()
+        logging.getLogger("custom_components.imo_relay.poller").addHandler(self.loop_errors)
+
+    def on_polled(self, device_id: int, since: float) -> None:
+        """Comme update_entities: publier les registres d'état lus pendant ce cycle."""
+        now = time.monotonic()
+        for address in (OUTPUT_STATE_REGISTER, LIGHT_STATE_REGISTER):
+            cached = self.cache.get(device_id, REGISTER_HOLDING, address)
+            if cached is not None and cached[1] >= since:
+                self.published[(device_id, address)] = cached[0][0]
+                self.history.record(device_id, address, cached[0][0], time.time())
+
+        ok = self.poller.last_success.get(device_id, 0.0) >= since
+        if not ok:
+            self.failing_since.setdefault(device_id, since)
+            return
+        started = self.failing_since.pop(device_id, None)
+        if started is not None:
+            self.read_outages.add(now - started)
+        if self.link.outage_id and self.recovered.get(device_id) != self.link.outage_id:
+            self.recovered[device_id] = self.link.outage_id
+            self.recovery.add(now - self.link.last_up)
+
+    async def sample_stale(self) -> None:
+        """Comparer en continu l'état publié à l'état réel des automates."""
+        period = 0.05
+        while True:
+            await asyncio.sleep(period)
+            now = time.monotonic()
+            for device_id, slave in self.slaves.items():
+                for address in (OUTPUT_STATE_REGISTER, LIGHT_STATE_REGISTER):
+                    key = (device_id, address)
+                    with self.link.lock:
+                        actual = slave.holding[address]
+                    if self.published.get(key) != actual:
+                        self.stale_time += period
+                        self.stale_since.setdefault(key, now)
+                    else:
+                        started = self.stale_since.pop(key, None)
+                        if started is not None:
+                            self.stale.add(now - started)
+            self.max_queue = max(self.max_queue, self.bus._queue.qsize())
+
+    async def local_changes(self) -> None:
+        """Changements d'état faits sur place, que la lecture cyclique doit remonter."""
+        if self.args.local_change_rate <= 0:
+            return
+        while True:
+            await asyncio.sleep(self.rng.expovariate(self.args.local_change_rate * len(self.slaves)))
+            slave = self.rng.choice(list(self.slaves.values()))
+            with self.link.lock:
+                slave.local_change()
+
+    async def one_command(self, device_id: int, output: int) -> None:
+        """Envoyer une commande par le filtre et vérifier l'état réel de l'automate au retour."""
+        slave = self.slaves[device_id]
+        target = self.rng.random() < 0.5
+        if self.rng.random() < self.args.toggle_share:
+            result = await self.filter.toggle_coil(
+                TOGGLE_COIL_BASE + output, device_id, LIGHT_STATE_REGISTER, output, target
+            )
+            with self.link.lock:
+                actual = bool(slave.holding[LIGHT_STATE_REGISTER] & (1 << output))
+            outcome = self.toggles
+            accepted = result == target
+        else:
+            accepted = await self.filter.write_coil(RELAY_COIL_BASE + output, target, device_id, state_bit=output)
+            with self.link.lock:
+                actual = bool(slave.holding[OUTPUT_STATE_REGISTER] & (1 << output))
+            outcome = self.commands
+        if not accepted:
+            outcome["failed"] += 1
+        elif actual != target:
+            outcome["lost"] += 1
+            _LOGGER.warning(f"Lost command: slave {device_id} output {output} reported {target}, actual {actual}")
+        else:
+            outcome["confirmed"] += 1
+
+    async def command_load(self) -> None:
+        """Commandes aléatoires, une seule à la fois par sortie (comme un utilisateur)."""
+        if self.args.command_rate <= 0:
+            return
+        busy: set[tuple[int, int]] = set()
+        tasks: set[asyncio.Task] = set()
+
+        async def run(key: tuple[int, int]) -> None:
+            try:
+                await self.one_command(*key)
+            finally:
+                busy.discard(key)
+
+        while True:
+            await asyncio.sleep(self.rng.expovariate(self.args.command_rate))
+            key = (self.rng.choice(list(self.slaves)), self.rng.randrange(OUTPUTS))
+            if key in busy:
+                continue
+            busy.add(key)
+            task = asyncio.get_running_loop().create_task(run(key))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+
+    async def one_proxy_request(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, transaction_id: int) -> None:
+        """Une requête MBAP vers le proxy; les écritures sont vérifiées sur l'automate simulé."""
+        device_id = self.rng.choice(list(self.slaves))
+        slave = self.slaves[device_id]
+        kind = self.rng.choice(["read_cached", "read_bus", "read_coils", "write", "write_multiple"])
+        written = None
+        if kind == "read_cached":
+            pdu = struct.pack(">BHH", 0x03, OUTPUT_STATE_REGISTER, 1)
+        elif kind == "read_bus":
+            pdu = struct.pack(">BHH", 0x03, SCRATCH_REGISTER, SCRATCH_COUNT)
+        elif kind == "read_coils":
+            pdu = struct.pack(">BHH", 0x01, RELAY_COIL_BASE, OUTPUTS)
+        elif kind == "write":
+            written = [self.rng.randrange(0x10000)]
+            pdu = struct.pack(">BHH", 0x06, SCRATCH_REGISTER, written[0])
+        else:
+            written = [self.rng.randrange(0x10000) for _ in range(SCRATCH_COUNT)]
+            pdu = struct.pack(f">BHHB{SCRATCH_COUNT}H", 0x10, SCRATCH_REGISTER, SCRATCH_COUNT, 2 * SCRATCH_COUNT, *written)
+
+        sent = time.monotonic()
+        writer.write(MBAP_HEADER.pack(transaction_id, 0, len(pdu) + 1, device_id) + pdu)
+        await writer.drain()
+        echoed, protocol_id, length, unit_id = MBAP_HEADER.unpack(await reader.readexactly(MBAP_HEADER.size))
+        response = await reader.readexactly(length - 1)
+        self.proxy_latency.add(time.monotonic() - sent)
+
+        if (echoed, protocol_id, unit_id) != (transaction_id, 0, device_id) or response[0] & 0x7F != pdu[0]:
+            self.proxy_requests["invalid"] += 1
+            _LOGGER.warning(f"Invalid proxy response to {pdu.hex()}: {response.hex()}")
+            return
+        if response[0] & 0x80:
+            self.proxy_requests["failed"] += 1
+            code = f"{response[1]:02X}"
+            self.proxy_exceptions[code] = self.proxy_exceptions.get(code, 0) + 1
+            return
+        if written is not None:
+            with self.link.lock:
+                actual = [slave.holding.get(SCRATCH_REGISTER + offset, 0) for offset in range(len(written))]
+            if actual != written:
+                self.proxy_requests["lost"] += 1
+                _LOGGER.warning(f"Lost proxy write: slave {device_id} registers {written}, actual {actual}")
+                return
+        self.proxy_requests["ok"] += 1
+
+    async def proxy_load(self, port: int) -> None:
+        """Client Modbus TCP local: une requête à la fois, comme un outil de supervision."""
+        if self.args.proxy_rate <= 0:
+            return
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        transaction_ids = itertools.count(1)
+        try:
+            while True:
+                await asyncio.sleep(self.rng.expovariate(self.args.proxy_rate))
+                await self.one_proxy_request(reader, writer, next(transaction_ids) & 0xFFFF)
+        finally:
+            writer.close()
+
+    def progress(self, elapsed: float, memory_growth: int | None) -> None:
+        growth = f", memory +{memory_growth / 1024:.0f} KiB" if memory_growth is not None else ""
+        _LOGGER.info(
+            f"[{elapsed:7.0f} s] polls {self.poller.stats['cycles']}, failed reads {self.poller.stats['failed_reads']}, "
+            f"commands {self.commands}, toggles {self.toggles}, proxy {self.proxy_requests}, faults {self.link.faults}{growth}"
+        )
+
+    async def run(self) -> dict:
+        args = self.args
+        loop = asyncio.get_running_loop()
+        hass = SoakHass(loop)
+
+        modbus_client.import_pymodbus()
+        client = ModbusRTUClient(port="simulated", baudrate=args.baudrate, timeout=args.timeout, name="Soak")
+        client.client = self.link
+
+        self.bus = ModbusBus(hass, client)
+        self.cache = RegisterCache()
+        self.history = OutputHistory(args.history_size)
+        self.filter = CommandFilter(
+            bus=self.bus,
+            cache=self.cache,
+            window=args.write_window,
+            rate_limit=args.write_rate_limit,
+            burst=args.write_burst,
+            state_max_age=args.state_max_age,
+            verify_delay=args.toggle_verify_delay,
+        )
+        blocks = {
+            device_id: {REGISTER_HOLDING: [(OUTPUT_STATE_REGISTER, 1), (LIGHT_STATE_REGISTER, 1), (ANALOG_REGISTER, ANALOG_COUNT)]}
+            for device_id in self.slaves
+        }
+        read_plan = build_read_plan(blocks)
+        self.poller = Poller(
+            self.bus, self.cache, read_plan, {device_id: args.poll_interval for device_id in read_plan}, self.on_polled
+        )
+
+        self.proxy = ModbusTCPProxy(
+            self.bus,
+            self.cache,
+            "127.0.0.1",
+            0,
+            max_cache_age=args.proxy_cache_age,
+            rate_limit=args.proxy_rate_limit,
+            burst=args.proxy_burst,
+        )
+
+        await hass.async_add_executor_job(client.connect)
+        self.bus.start()
+        for device_id in read_plan:
+            await self.poller.poll_device(device_id)
+        await self.proxy.async_start()
+        proxy_port = self.proxy._server.sockets[0].getsockname()[1]
+
+        tasks = [
+            loop.create_task(self.poller.run()),
+            loop.create_task(self.sample_stale()),
+            loop.create_task(self.local_changes()),
+            loop.create_task(self.command_load()),
+            loop.create_task(self.proxy_load(proxy_port)),
+        ]
+
+        start = time.monotonic()
+        warmup = min(args.warmup, args.duration / 2)
+        baseline = None
+        baseline_snapshot = None
+        next_report = start + args.report_every
+        try:
+            while (now := time.monotonic()) < start + args.duration:
+                await asyncio.sleep(min(1.0, start + args.duration - now))
+                now = time.monotonic()
+                if baseline is None and now - start >= warmup and tracemalloc.is_tracing():
+                    baseline = tracemalloc.get_traced_memory()[0]
+                    baseline_snapshot = tracemalloc.take_snapshot()
+                if now >= next_report:
+                    next_report += args.report_every
+                    growth = tracemalloc.get_traced_memory()[0] - baseline if baseline is not None else None
+                    self.progress(now - start, growth)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await self.proxy.async_stop()
+            await self.bus.stop()
+            client.close()
+            hass.executor.shutdown(wait=True)
+
+        report = {
+            "duration": args.duration,
+            "slaves": len(self.slaves),
+            "faults": dict(self.link.faults),
+            "polls": dict(self.poller.stats),
+            "commands": dict(self.commands),
+            "toggles": dict(self.toggles),
+            "command_filter": dict(self.filter.stats),
+            "proxy_requests": dict(self.proxy_requests),
+            "proxy_exceptions": dict(self.proxy_exceptions),
+            "proxy_latency_ms": self.proxy_latency.as_dict(1000),
+            "proxy": dict(self.proxy.stats),
+            "recovery_after_disconnect_s": self.recovery.as_dict(),
+            "read_outages_s": self.read_outages.as_dict(),
+            "stale_episodes_s": self.stale.as_dict(),
+            "stale_time_s": round(self.stale_time, 1),
+            "max_bus_queue": self.max_queue,
+            "update_loop_errors": self.loop_errors.count,
+            "bus_transactions": {str(priority): count for priority, count in self.bus.stats["transactions"].items()},
+        }
+        if baseline is not None:
+            current = tracemalloc.get_traced_memory()[0]
+            report["memory_growth_kib"] = round((current - baseline) / 1024, 1)
+            top = tracemalloc.take_snapshot().compare_to(baseline_snapshot, "lineno")[:5]
+            report["memory_top_growth"] = [str(stat) for stat in top]
+        return report
+
+
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Fault-injection soak test for the IMO Relay bus stack")
+    parser.add_argument("--duration", type=float, default=600, help="Test duration (s)")
+    parser.add_argument("--slaves", type=int, default=3, help="Number of simulated slaves")
+    parser.add_argument("--seed", type=int, default=None, help="Random seed (reproducible fault sequence)")
+    # Bus
+    parser.add_argument("--baudrate", type=int, default=38400)
+    parser.add_argument("--turnaround-ms", type=float, default=10, help="Slave response time (ms)")
+    parser.add_argument("--timeout", type=float, default=0.5, help="Reply timeout (s)")
+    parser.add_argument("--poll-interval", type=float, default=1.0, help="Poll interval per slave (s)")
+    # Fautes (probabilité par transaction)
+    parser.add_argument("--corrupt", type=float, default=0.01, help="Probability of a corrupted (CRC) frame")
+    parser.add_argument("--drop", type=float, default=0.01, help="Probability of a dropped frame (timeout)")
+    parser.add_argument("--busy", type=float, default=0.005, help="Probability of a slave busy exception")
+    parser.add_argument("--delay", type=float, default=0.02, help="Probability of a delayed reply")
+    parser.add_argument("--delay-ms", type=float, default=200, help="Extra delay of a delayed reply (ms)")
+    parser.add_argument("--disconnect-every", type=float, default=300, help="Mean time between port disconnects (s, 0 = never)")
+    parser.add_argument("--disconnect-for", type=float, default=5, help="Duration of a port disconnect (s)")
+    # Charge
+    parser.add_argument("--command-rate", type=float, default=0.5, help="Commands per second")
+    parser.add_argument("--toggle-share", type=float, default=0.3, help="Share of commands sent to toggle coils")
+    parser.add_argument("--local-change-rate", type=float, default=0.02, help="Local output changes per second per slave")
+    parser.add_argument("--proxy-rate", type=float, default=2, help="Modbus TCP proxy requests per second (0 = no proxy client)")
+    # Réglages de l'intégration
+    parser.add_argument("--write-window", type=float, default=0.3)
+    parser.add_argument("--write-rate-limit", type=float, default=10)
+    parser.add_argument("--write-burst", type=int, default=20)
+    parser.add_argument("--state-max-age", type=float, default=5.0)
+    parser.add_argument("--toggle-verify-delay", type=float, default=0.3)
+    parser.add_argument("--history-size", type=int, default=512)
+    parser.add_argument("--proxy-cache-age", type=float, default=2.0)
+    parser.add_argument("--proxy-rate-limit", type=float, default=5)
+    parser.add_argument("--proxy-burst", type=int, default=10)
+    # Rapport
+    parser.add_argument("--warmup", type=float, default=60, help="Warm-up before the memory baseline (s)")
+    parser.add_argument("--report-every", type=float, default=60, help="Progress report period (s)")
+    parser.add_argument("--max-memory-growth", type=float, default=1024, help="Allowed memory growth after warm-up (KiB)")
+    parser.add_argument("--no-tracemalloc", action="store_true", help="Disable memory tracking (faster)")
+    parser.add_argument("--json", type=Path, help="Write the final report to this file")
+    parser.add_argument("-v", "--verbose", action="store_true", help="Show integration logs")
+    return parser.parse_args(argv)
+
+
+def main(argv: list[str] | None = None) -> int:
+    args = parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    # Chaque faute injectée produit une erreur dans les logs du client et du filtre des commandes
+    logging.getLogger("custom_components.imo_relay").setLevel(logging.DEBUG if args.verbose else logging.WARNING)
+    if not args.verbose:
+        logging.getLogger("custom_components.imo_relay.modbus_client").setLevel(logging.CRITICAL)
+        logging.getLogger("custom_components.imo_relay.commands").setLevel(logging.CRITICAL)
+
+    if not args.no_tracemalloc:
+        tracemalloc.start()
+    report = asyncio.run(SoakRun(args).run())
+
+    print(json.dumps(report, indent=2))
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2))
+
+    lost = report["commands"]["lost"] + report["toggles"]["lost"] + report["proxy_requests"]["lost"]
+    growth = report.get("memory_growth_kib", 0.0)
+    errors = report["update_loop_errors"] + report["proxy_requests"]["invalid"]
+    if lost or errors or growth > args.max_memory_growth:
+        _LOGGER.error(f"Soak test failed: {lost} lost commands, {errors} update loop errors, memory growth {growth} KiB")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())